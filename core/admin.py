@@ -1,8 +1,10 @@
 from django.contrib import admin
 
-from .models import Profile, Post, LikePost, FollowersCount
+from .models import Profile, Post, LikePost, FollowersCount, TimelineEntry, Task
 
 admin.site.register(Profile)
 admin.site.register(Post)
 admin.site.register(LikePost)
-admin.site.register(FollowersCount)
\ No newline at end of file
+admin.site.register(FollowersCount)
+admin.site.register(TimelineEntry)
+admin.site.register(Task)
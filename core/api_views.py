@@ -0,0 +1,82 @@
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from . import feed, likes, fragments
+
+
+def serialize_post(post):
+    """
+    :param post: post of a feed page
+    :type post: PostModel
+    :returns: compact JSON representation of post, the thumbnail falls back to the original image
+    :rtype: dict
+    """
+    thumbnail = post.image_thumbnail or post.image
+    return {
+        'id': str(post.id),
+        'author': post.user_id,
+        'thumbnail': thumbnail.url if thumbnail else None,
+        'caption': post.caption,
+        'likes': post.no_of_likes,
+        'created_at': post.created_at.isoformat(),
+    }
+
+
+@require_GET
+def feed_page(request):
+    """
+    Returns one page of the home feed of logged in user as JSON.
+    The ETag covers the posts of the page together with their versions, see fragments.feed_page_key,
+    so polling with If-None-Match is answered with 304 until the page changes
+
+    :param request: contains info about logged in user
+    :type request: {
+        user: {
+            username: string
+        },
+        GET: {
+            cursor: string, next_cursor of the previous page, the newest page if missing,
+            mode: 'latest' or 'top', newest posts or highest decaying like score first
+        }
+    }
+    :returns: JSON object: {
+        posts: page of posts of followed users, newest or top ranked first,
+        next_cursor: cursor of the following page, null if there are no older posts
+    }
+    :type returns: {
+        posts: {id: string, author: string, thumbnail: string, caption: string, likes: number, created_at: string}[];
+        next_cursor: string or null
+    }
+    :raises Unauthorized or BadRequest
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    before = None
+    if request.GET.get('cursor'):
+        try:
+            before = feed.decode_cursor(request.GET['cursor'])
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    username = request.user.username
+    try:
+        posts, next_before = feed.page(request.user, before, mode=feed.parse_mode(request.GET.get('mode')))
+    except ValueError:
+        # the post of the cursor has been purged, restarting at the newest page would repeat posts
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    posts = likes.buffer.merge_pending(posts)
+
+    etag = quote_etag(fragments.feed_page_key(username, before, posts))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({
+            'posts': [serialize_post(post) for post in posts],
+            'next_cursor': feed.encode_cursor(next_before),
+        })
+    response['ETag'] = etag
+    # a cached page has to be revalidated, it is only valid for this viewer
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
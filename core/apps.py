@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .middleware import install_query_timing
+        from .sqlite import install_pragmas
+        from .auth_cache import install_invalidation
+        from .template_cache import warm
+
+        # before any connection opens, the request metrics middleware is only loaded with the first request
+        install_query_timing()
+        install_pragmas()
+        install_invalidation()
+        if getattr(settings, 'TEMPLATE_WARMUP', False):
+            # compiled into the cached loader before the first request
+            warm()
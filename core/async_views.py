@@ -0,0 +1,114 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render
+
+from .models import Profile, Post, FollowersCount
+from . import feed, suggestions, likes, fragments
+
+
+def async_login_required(view):
+    """
+    login_required for coroutine views, request.user is resolved off the event loop
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path(), 'signin')
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _list(queryset):
+    return [item async for item in queryset]
+
+
+async def _feed_page(user, before, mode):
+    try:
+        return await sync_to_async(feed.page)(user, before, feed.FEED_FIRST_SCREEN_SIZE, mode)
+    except ValueError:
+        # see views.index
+        return [], None
+
+
+@async_login_required
+async def index(request):
+    """
+    Async variant of views.index for ASGI deployments.
+    Viewer profile, feed page and suggestions are looked up concurrently
+
+    :param request: contains info  about logged in user
+    :type request: {
+        user: {
+            username: string
+        },
+        GET: {
+            before: string,
+            mode: string
+        }
+    }
+    :return: renders index.html template with the same info as views.index
+    :raises Unauthorized
+    """
+    user_object = request.user
+    before = request.GET.get('before')
+    mode = feed.parse_mode(request.GET.get('mode'))
+    user_profile, (feed_list, next_before), suggestions_username_profile_list = await asyncio.gather(
+        Profile.objects.aget(user=user_object),
+        _feed_page(user_object, before, mode),
+        sync_to_async(suggestions.suggestions_for)(user_object.username),
+    )
+    feed_list = likes.buffer.merge_pending(feed_list)
+    feed_page_key = await sync_to_async(fragments.feed_page_key)(user_object.username, before, feed_list)
+
+    return await sync_to_async(render)(request, 'index.html',
+                  {
+                      'user_profile': user_profile,
+                      'posts': feed_list,
+                      'feed_mode': mode,
+                      'next_before': next_before,
+                      'next_cursor': feed.encode_cursor(next_before),
+                      'feed_page_key': feed_page_key,
+                      'suggestions_username_profile_list': suggestions_username_profile_list
+                  }
+                  )
+
+
+@async_login_required
+async def profile(request, pk):
+    """
+    Async variant of views.profile for ASGI deployments.
+    Profile with its counters, posts and follow state are looked up concurrently
+
+    :param request: contains user object with username;
+            pk: name of logged in user
+    :type request: {
+        user: {
+            username: string
+        },
+        pk: string
+    }
+    :renders: profile.html template with the same info as views.profile
+    :raises BadRequest or Unauthorized
+    """
+    user_profile, user_posts, is_following, post_grid_key = await asyncio.gather(
+        Profile.objects.select_related('user').aget(user__username=pk),
+        _list(Post.objects.filter(user=pk)),
+        FollowersCount.objects.filter(follower=request.user.username, user=pk).aexists(),
+        sync_to_async(fragments.post_grid_key)(pk),
+    )
+    context = {
+        'user_object': user_profile.user,
+        'user_profile': user_profile,
+        'user_posts': likes.buffer.merge_pending(user_posts),
+        'post_grid_key': post_grid_key,
+        'user_post_length': user_profile.posts_count,
+        'button_text': 'Unfollow' if is_following else 'Follow',
+        'user_followers': user_profile.followers_count,
+        'user_following': user_profile.following_count,
+    }
+
+    return await sync_to_async(render)(request, 'profile.html', context)
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import Profile
+from . import passwords
+
+# Cache holding logged in users and their profiles. With several worker processes it has to be
+# a shared backend, otherwise invalidations only reach the process which made the change
+AUTH_CACHE_ALIAS = getattr(settings, 'AUTH_CACHE_ALIAS', 'default')
+# Users and profiles are kept as long as a session lives at most
+AUTH_CACHE_TIMEOUT = getattr(settings, 'AUTH_CACHE_TIMEOUT', settings.SESSION_COOKIE_AGE)
+
+
+def _cache():
+    return caches[AUTH_CACHE_ALIAS]
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _profile_key(username):
+    return f'auth-profile:{username}'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend which reads the user of a session from the cache.
+    django.contrib.auth.get_user still verifies the session hash against the cached user,
+    every save of the user drops it from the cache, so password changes log other sessions out.
+    Passwords are checked in the bounded hashing pool of core.passwords. A failed check raises PermissionDenied,
+    which ends django.contrib.auth.authenticate, so ModelBackend listed after it for old sessions never hashes again
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hashes anyway, so unknown usernames take as long as wrong passwords
+            passwords.make(password)
+            raise PermissionDenied
+        if passwords.check(user, password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
+
+    def get_user(self, user_id):
+        cache = _cache()
+        user = cache.get(_user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(_user_key(user_id), user, AUTH_CACHE_TIMEOUT)
+        return user
+
+
+def get_profile(user):
+    """
+    :param user: logged in user
+    :type user: UserModel
+    :returns: cached profile of user, None if user has no profile
+    :rtype: ProfileModel or None
+    """
+    cache = _cache()
+    profile = cache.get(_profile_key(user.username))
+    if profile is None:
+        profile = Profile.objects.filter(user=user).first()
+        if profile is None:
+            return None
+        cache.set(_profile_key(user.username), profile, AUTH_CACHE_TIMEOUT)
+    # shares the user instance instead of caching a second copy of it
+    profile.user = user
+    return profile
+
+
+def _delete_now_and_on_commit(key):
+    # a request reading the old row before the commit may cache it again, the second delete drops that copy
+    _cache().delete(key)
+    transaction.on_commit(lambda: _cache().delete(key))
+
+
+def invalidate_user(user_id):
+    _delete_now_and_on_commit(_user_key(user_id))
+
+
+def invalidate_profile(username):
+    _delete_now_and_on_commit(_profile_key(username))
+
+
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    invalidate_profile(instance.username)
+
+
+def _profile_changed(sender, instance, **kwargs):
+    invalidate_profile(instance.user.username)
+
+
+def install_invalidation():
+    """
+    Drops cached users and profiles whenever they are saved or deleted.
+    Queryset updates send no signals, their callers invalidate themselves, see counters.adjust.
+    Entries are dropped at once and again when the transaction which made the change commits
+    """
+    User = get_user_model()
+    post_save.connect(_user_changed, sender=User, dispatch_uid='core.auth_cache.user_saved')
+    post_delete.connect(_user_changed, sender=User, dispatch_uid='core.auth_cache.user_deleted')
+    post_save.connect(_profile_changed, sender=Profile, dispatch_uid='core.auth_cache.profile_saved')
+    post_delete.connect(_profile_changed, sender=Profile, dispatch_uid='core.auth_cache.profile_deleted')
@@ -0,0 +1,184 @@
+import asyncio
+import io
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import AsyncClient, Client
+
+from .models import Post
+
+ROUTES = ('index', 'profile', 'search', 'like-post', 'follow', 'upload', 'index-async', 'profile-async')
+
+# 1x1 transparent png used as upload body
+_PIXEL_PNG = (
+    b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89'
+    b'\x00\x00\x00\rIDATx\x9cc\xf8\xff\xff?\x03\x00\x08\xfc\x02\xfe\xa7\x9a\xa0\xa0\x00\x00\x00\x00IEND\xaeB`\x82'
+)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Workload:
+    """Builds deterministic requests for every benchmarked route out of the data in the database"""
+
+    def __init__(self, seed, sample_size=1000):
+        self.rng = random.Random(seed)
+        self.usernames = list(
+            User.objects.filter(profile__isnull=False).order_by('id').values_list('username', flat=True)[:sample_size]
+        )
+        self.post_ids = [str(post_id) for post_id in Post.objects.order_by('id').values_list('id', flat=True)[:sample_size]]
+        if not self.usernames:
+            raise ValueError('The database holds no users, seed it with seed_data first')
+
+    def viewer(self):
+        return self.rng.choice(self.usernames)
+
+    def request(self, route, viewer):
+        """:returns: method name, path and data of one request to route"""
+        if route == 'index':
+            return 'get', '/', {}
+        if route == 'profile':
+            return 'get', f'/profile/{self.rng.choice(self.usernames)}', {}
+        if route == 'index-async':
+            return 'get', '/async/', {}
+        if route == 'profile-async':
+            return 'get', f'/async/profile/{self.rng.choice(self.usernames)}', {}
+        if route == 'search':
+            username = self.rng.choice(self.usernames)
+            start = self.rng.randrange(max(len(username) - 3, 1))
+            return 'post', '/search', {'username': username[start:start + 3]}
+        if route == 'like-post':
+            return 'get', '/like-post', {'post_id': self.rng.choice(self.post_ids)}
+        if route == 'follow':
+            return 'post', '/follow', {'follower': viewer, 'user': self.rng.choice(self.usernames)}
+        if route == 'upload':
+            image = io.BytesIO(_PIXEL_PNG)
+            image.name = 'benchmark.png'
+            return 'post', '/upload', {'image_upload': image, 'caption': 'Benchmark post'}
+        raise ValueError(f'Unknown route {route}')
+
+
+def run_route(route, workload, requests, concurrency):
+    """
+    Sends requests to one route through the full middleware stack, every worker is logged in as another user.
+    WSGI routes run concurrency threads, '-async' routes run concurrency tasks on one event loop
+    through the ASGI handler, like a single ASGI worker would
+
+    :returns: latency percentiles in milliseconds, throughput and queries per request
+    :rtype: dict
+    """
+    plans = []
+    for i in range(concurrency):
+        viewer = workload.viewer()
+        plans.append((viewer, [workload.request(route, viewer) for _ in range(i, requests, concurrency)]))
+
+    latencies = []
+    queries = []
+    errors = 0
+
+    def record(elapsed, response, request):
+        nonlocal errors
+        latencies.append(elapsed)
+        if response is None or response.status_code >= 400:
+            errors += 1
+        elif hasattr(getattr(response, request), 'metrics'):
+            queries.append(getattr(response, request).metrics.queries)
+
+    started = time.perf_counter()
+    if route.endswith('-async'):
+        asyncio.run(_run_tasks(plans, record))
+    else:
+        _run_threads(plans, record)
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'throughput_rps': round(requests / duration, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def _run_threads(plans, record):
+    lock = threading.Lock()
+
+    def worker(viewer, plan):
+        client = Client()
+        client.force_login(User.objects.get(username=viewer))
+        try:
+            for method, path, data in plan:
+                start = time.perf_counter()
+                try:
+                    response = getattr(client, method)(path, data)
+                except Exception:
+                    response = None
+                elapsed = time.perf_counter() - start
+                with lock:
+                    record(elapsed, response, 'wsgi_request')
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(plans)) as executor:
+        list(executor.map(lambda args: worker(*args), plans))
+
+
+async def _run_tasks(plans, record):
+    clients = []
+    for viewer, plan in plans:
+        client = AsyncClient()
+        user = await User.objects.aget(username=viewer)
+        # force_login has no async variant yet, it writes the session
+        await sync_to_async(client.force_login)(user)
+        clients.append((client, plan))
+
+    async def worker(client, plan):
+        for method, path, data in plan:
+            start = time.perf_counter()
+            try:
+                response = await getattr(client, method)(path, data)
+            except Exception:
+                response = None
+            record(time.perf_counter() - start, response, 'asgi_request')
+
+    try:
+        await asyncio.gather(*(worker(client, plan) for client, plan in clients))
+    finally:
+        # sync code of every task ran in the same thread sensitive executor thread
+        await sync_to_async(connections.close_all)()
+
+
+def compare(baseline, current):
+    """
+    :returns: relative change of every metric of every route present in both reports, e.g. 0.1 is 10% more
+    :rtype: { [route]: { [metric]: number } }
+    """
+    changes = {}
+    for route, metrics in current['routes'].items():
+        previous = baseline.get('routes', {}).get(route)
+        if previous is None:
+            continue
+        changes[route] = {
+            metric: round((value - previous[metric]) / previous[metric], 4)
+            for metric, value in metrics.items()
+            if isinstance(value, (int, float)) and previous.get(metric)
+            and metric not in ('requests', 'concurrency')
+        }
+    return changes
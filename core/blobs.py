@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import shutil
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Blob, Post, Profile
+from .storage import blob_name, is_blob_name, media_storage
+from . import fragments, auth_cache
+
+logger = logging.getLogger(__name__)
+
+# Rows per query when reference counts are rebuilt
+BLOB_BATCH_SIZE = getattr(settings, 'BLOB_BATCH_SIZE', 1000)
+
+# Fields whose files are counted, variants share the content address of their original
+BLOB_FIELDS = {
+    Post: ('image', 'image_thumbnail', 'image_feed'),
+    Profile: ('profileimg', 'profileimg_thumbnail'),
+}
+
+
+def _blob_names(names):
+    return [name for name in names if is_blob_name(name)]
+
+
+def retain(*names):
+    """
+    Counts one more reference of every blob in names, names outside content addressed storage are ignored
+
+    :param names: names of stored files
+    :type names: strings
+    """
+    names = _blob_names(names)
+    if not names:
+        return
+    with transaction.atomic(savepoint=False):
+        Blob.objects.bulk_create([Blob(name=name) for name in set(names)], ignore_conflicts=True)
+        for name in names:
+            Blob.objects.filter(name=name).update(references=F('references') + 1)
+
+
+def release(*names):
+    """
+    Counts one reference less of every blob in names and forgets blobs which are not referenced anymore.
+    Their files are left to cleanup.sweep_orphaned_files, a concurrent upload of the same content
+    may reuse a file until its grace period has passed
+
+    :param names: names of stored files
+    :type names: strings
+    :returns: names of blobs which are not referenced anymore
+    :rtype: string[]
+    """
+    names = _blob_names(names)
+    if not names:
+        return []
+    with transaction.atomic(savepoint=False):
+        for name in names:
+            Blob.objects.filter(name=name).update(references=F('references') - 1)
+        unreferenced = list(Blob.objects.filter(name__in=names, references__lte=0).values_list('name', flat=True))
+        Blob.objects.filter(name__in=unreferenced, references__lte=0).delete()
+    return unreferenced
+
+
+def rebuild_references(batch_size=BLOB_BATCH_SIZE):
+    """
+    Recounts references of every blob from the image fields of all posts and profiles.
+    Needed after rows changed without retain and release, e.g. bulk imports or cascading user deletes
+
+    :returns: amount of referenced blobs
+    :rtype: number
+    """
+    counts = {}
+    for model, fields in BLOB_FIELDS.items():
+        manager = model.all_objects if model is Post else model.objects
+        for row in manager.order_by('pk').values_list(*fields).iterator(chunk_size=batch_size):
+            for name in _blob_names(row):
+                counts[name] = counts.get(name, 0) + 1
+
+    with transaction.atomic():
+        Blob.objects.all().delete()
+        Blob.objects.bulk_create(
+            [Blob(name=name, references=references) for name, references in counts.items()],
+            batch_size=batch_size,
+        )
+    return len(counts)
+
+
+def _adopt_file(name, directory):
+    """
+    Hard links or copies a file of default storage naming to its blob name
+
+    :returns: blob name and whether the blob has been stored before, None if the file is missing
+    :rtype: (string, boolean) or None
+    """
+    storage = media_storage()
+    path = storage.path(name)
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(64 * 1024), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+
+    target = blob_name(directory, digest.hexdigest(), os.path.splitext(name)[1])
+    target_path = storage.path(target)
+    if os.path.exists(target_path):
+        return target, True
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temporary = f'{target_path}.adopting'
+    try:
+        os.link(path, temporary)
+    except OSError:
+        shutil.copyfile(path, temporary)
+    os.replace(temporary, target_path)
+    return target, False
+
+
+def dedupe(model, field, batch_size=BLOB_BATCH_SIZE):
+    """
+    Moves files of field which have been stored before content addressed storage to their blob names.
+    Distinct names are walked in batches, the rows of every name are updated in one short transaction
+    and the old file is deleted afterwards, so an interrupted run can be started again.
+    Files outside the upload_to directory of field, e.g. the default profile image, stay where they are
+
+    :param model: Post or Profile
+    :param field: name of an image field of model
+    :type field: string
+    :returns: amount of moved names, of missing files and bytes freed by deleting duplicates
+    :rtype: (number, number, number)
+    """
+    manager = model.all_objects if model is Post else model.objects
+    owner = 'user' if model is Post else 'user__username'
+    directory = model._meta.get_field(field).upload_to
+    names = manager.filter(**{f'{field}__startswith': f'{directory}/'}).order_by(field).values_list(field, flat=True)
+
+    moved = 0
+    missing = 0
+    freed = 0
+    last = ''
+    while True:
+        batch = list(names.filter(**{f'{field}__gt': last}).distinct()[:batch_size])
+        if not batch:
+            return moved, missing, freed
+        last = batch[-1]
+        for name in batch:
+            if is_blob_name(name):
+                continue
+            adopted = _adopt_file(name, directory)
+            if adopted is None:
+                logger.warning('%s.%s refers to the missing file %s', model.__name__, field, name)
+                missing += 1
+                continue
+            target, duplicate = adopted
+            rows = manager.filter(**{field: name})
+            usernames = list(rows.values_list(owner, flat=True).distinct())
+            with transaction.atomic():
+                rows.update(**{field: target})
+
+            # cached pages and profiles still point to the old name
+            fragments.bump(*[('author', username) for username in usernames])
+            for username in usernames:
+                auth_cache.invalidate_profile(username)
+            path = media_storage().path(name)
+            if os.path.exists(path):
+                if duplicate:
+                    freed += os.path.getsize(path)
+                os.remove(path)
+            moved += 1
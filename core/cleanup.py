@@ -0,0 +1,197 @@
+import itertools
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Post, LikePost, TimelineEntry, Blob
+from .storage import is_blob_name
+from . import blobs, tasks
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per statement, every batch commits on its own so no delete holds the tables for long
+CLEANUP_BATCH_SIZE = getattr(settings, 'CLEANUP_BATCH_SIZE', 1000)
+# Upload directory of post images, variants live in its 'variants' subdirectory
+POST_IMAGES_DIR = 'post_images'
+# Upload directory of profile images, only its blobs are swept, the default image lives next to them
+PROFILE_IMAGES_DIR = 'profile_images'
+IMAGE_FIELDS = ('image', 'image_thumbnail', 'image_feed')
+# Seconds a stored file is kept before it may be swept as orphaned, its post might not have been committed yet
+CLEANUP_FILE_GRACE = getattr(settings, 'CLEANUP_FILE_GRACE', 60 * 60)
+# Seconds between runs of the orphaned file sweep on the task queue
+CLEANUP_SWEEP_INTERVAL = getattr(settings, 'CLEANUP_SWEEP_INTERVAL', 6 * 60 * 60)
+
+
+def _delete_in_batches(queryset, batch_size):
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(pk__in=ids).delete()[0]
+
+
+def _referenced_files(names):
+    """:returns: those of names which are the image or an image variant of any post or profile"""
+    referenced = set()
+    for model, fields in blobs.BLOB_FIELDS.items():
+        query = Q()
+        for field in fields:
+            query |= Q(**{f'{field}__in': names})
+        manager = model.all_objects if model is Post else model.objects
+        for row in manager.filter(query).values_list(*fields):
+            referenced.update(row)
+    return referenced & set(names)
+
+
+def _delete_files(names):
+    deleted = 0
+    for name in names:
+        try:
+            if default_storage.exists(name):
+                default_storage.delete(name)
+                deleted += 1
+        except OSError:
+            logger.exception('Deleting file %s failed', name)
+    return deleted
+
+
+def purge_post(post_id, batch_size=CLEANUP_BATCH_SIZE):
+    """
+    Removes a deleted post for good: its likes and timeline entries batch by batch, the row itself
+    and its references to its image and variants. Files nothing refers to anymore are deleted by sweep_orphaned_files.
+    Safe to run repeatedly and concurrently for the same post
+
+    :param post_id: id of a post marked as deleted
+    :type post_id: string
+    :returns: amount of deleted likes
+    :rtype: number
+    """
+    post = Post.all_objects.filter(id=post_id, deleted_at__isnull=False).first()
+    if post is None:
+        return 0
+
+    likes = _delete_in_batches(LikePost.objects.filter(post_id=post.id), batch_size)
+    _delete_in_batches(TimelineEntry.objects.filter(post_id=post.id), batch_size)
+
+    names = [getattr(post, field).name for field in IMAGE_FIELDS if getattr(post, field)]
+    with transaction.atomic():
+        _, deleted = Post.all_objects.filter(id=post.id).delete()
+        if deleted.get(Post._meta.label) != 1:
+            # a concurrent purge has removed the row and released its files already
+            return likes
+        blobs.release(*names)
+    # files stored before content addressed storage are not counted, they are kept while another post refers to them
+    legacy = [name for name in names if not is_blob_name(name)]
+    _delete_files(set(legacy) - _referenced_files(legacy))
+    return likes
+
+
+@tasks.handler('cleanup.purge_post')
+def purge_posts(payloads):
+    for payload in payloads:
+        purge_post(payload['post'])
+
+
+def delete_post(post_id):
+    """
+    Marks a post as deleted, it disappears from every page at once.
+    Likes, timeline entries and files are removed by a queued task once the current transaction commits
+
+    :param post_id: id of the post
+    :type post_id: string
+    :returns: username of the author, None if there is no such post
+    :rtype: string or None
+    """
+    author = Post.objects.filter(id=post_id).values_list('user', flat=True).first()
+    if author is None:
+        return None
+    Post.objects.filter(id=post_id).update(deleted_at=timezone.now())
+    # a failing purge is retried by the task queue, sweep_orphans picks up posts whose task failed for good
+    tasks.enqueue('cleanup.purge_post', {'post': str(post_id)}, key=f'purge-post:{post_id}')
+    return author
+
+
+def sweep_deleted_posts(batch_size=CLEANUP_BATCH_SIZE, pause=0):
+    """
+    Purges posts which are marked as deleted but whose cleanup job never ran or failed
+
+    :returns: amount of purged posts and their deleted likes
+    :rtype: (number, number)
+    """
+    purged = 0
+    likes = 0
+    while True:
+        post_ids = list(
+            Post.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not post_ids:
+            return purged, likes
+        for post_id in post_ids:
+            likes += purge_post(post_id, batch_size)
+            purged += 1
+        time.sleep(pause)
+
+
+def _stored_files(directory):
+    """Walks directory of the default storage, yields names of files relative to MEDIA_ROOT"""
+    try:
+        subdirectories, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        yield os.path.join(directory, filename)
+    for subdirectory in subdirectories:
+        yield from _stored_files(os.path.join(directory, subdirectory))
+
+
+def sweep_orphaned_files(grace=CLEANUP_FILE_GRACE, batch_size=CLEANUP_BATCH_SIZE, pause=0):
+    """
+    Deletes post images and variants no post refers to, and profile image blobs no profile refers to.
+    This is where files of released blobs go away, see blobs.release, workers of the task queue
+    run it every CLEANUP_SWEEP_INTERVAL seconds. Files younger than grace seconds are kept, their post might not have been committed yet
+
+    :returns: amount of checked and deleted files
+    :rtype: (number, number)
+    """
+    cutoff = time.time() - grace
+    checked = 0
+    deleted = 0
+    batch = []
+
+    def flush():
+        nonlocal deleted
+        orphaned = [
+            name for name in set(batch) - _referenced_files(batch)
+            if default_storage.get_modified_time(name).timestamp() < cutoff
+        ]
+        deleted += _delete_files(orphaned)
+        # reference counts left behind by rows removed without releasing their files
+        Blob.objects.filter(name__in=orphaned).delete()
+        batch.clear()
+        time.sleep(pause)
+
+    stored = itertools.chain(
+        _stored_files(POST_IMAGES_DIR),
+        (name for name in _stored_files(PROFILE_IMAGES_DIR) if is_blob_name(name)),
+    )
+    for name in stored:
+        checked += 1
+        batch.append(name)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return checked, deleted
+
+
+@tasks.handler('cleanup.sweep_orphaned_files', every=CLEANUP_SWEEP_INTERVAL)
+def sweep_orphaned_files_task(payloads):
+    sweep_orphaned_files()
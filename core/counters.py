@@ -0,0 +1,227 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Profile, Post, LikePost, FollowersCount
+from . import auth_cache, fragments, likes, tasks
+
+# How many profiles are reconciled per round of aggregate queries
+COUNTERS_BATCH_SIZE = getattr(settings, 'COUNTERS_BATCH_SIZE', 1000)
+# How many posts are reconciled per transaction, see reconcile_likes
+LIKES_RECONCILE_BATCH_SIZE = getattr(settings, 'LIKES_RECONCILE_BATCH_SIZE', 1000)
+
+COUNTER_FIELDS = ('followers_count', 'following_count', 'posts_count')
+
+
+def adjust(username, **deltas):
+    """
+    Atomically shifts denormalized counters of a profile, e.g. adjust('bob', followers_count=1)
+
+    :param username: username of the profile owner
+    :type username: string
+    """
+    Profile.objects.filter(user__username=username).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    auth_cache.invalidate_profile(username)
+
+
+def _counts(queryset, field, usernames):
+    return dict(
+        queryset.filter(**{f'{field}__in': usernames})
+        .order_by()
+        .values_list(field)
+        .annotate(n=Count('id'))
+    )
+
+
+def true_counts(usernames):
+    """
+    Computes real counter values for a chunk of users with one grouped query per counter
+
+    :param usernames: usernames to count for
+    :type usernames: string[]
+    :returns: counters by username
+    :rtype: { [username]: { followers_count: number, following_count: number, posts_count: number } }
+    """
+    followers = _counts(FollowersCount.objects, 'user', usernames)
+    following = _counts(FollowersCount.objects, 'follower', usernames)
+    posts = _counts(Post.objects, 'user', usernames)
+    return {
+        username: {
+            'followers_count': followers.get(username, 0),
+            'following_count': following.get(username, 0),
+            'posts_count': posts.get(username, 0),
+        }
+        for username in usernames
+    }
+
+
+def _profiles(usernames):
+    return Profile.objects.filter(user__username__in=usernames).select_related('user').only(
+        'id', 'user__username', *COUNTER_FIELDS
+    )
+
+
+def _correct(profiles):
+    """Writes real counter values to those of profiles which drifted, :returns: the drifted profiles"""
+    counts = true_counts([profile.user.username for profile in profiles])
+    drifted = []
+    for profile in profiles:
+        real = counts[profile.user.username]
+        if any(getattr(profile, field) != value for field, value in real.items()):
+            for field, value in real.items():
+                setattr(profile, field, value)
+            drifted.append(profile)
+
+    if drifted:
+        Profile.objects.bulk_update(drifted, COUNTER_FIELDS)
+    return drifted
+
+
+def reconcile(batch_size=COUNTERS_BATCH_SIZE):
+    """
+    Recomputes counters of all profiles chunk by chunk and writes back only the drifted ones.
+    Chunks are walked by primary key, so no long running read holds the tables
+
+    :param batch_size: amount of profiles per chunk
+    :type batch_size: number
+    :returns: amount of checked and corrected profiles
+    :rtype: (number, number)
+    """
+    checked = 0
+    corrected = 0
+    last_id = 0
+    while True:
+        chunk = list(
+            Profile.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .select_related('user')
+            .only('id', 'user__username', *COUNTER_FIELDS)[:batch_size]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        checked += len(chunk)
+        corrected += len(_correct(chunk))
+    return checked, corrected
+
+
+def recount(*usernames):
+    """
+    Queues a recount of the counters of usernames, see recount_profiles
+
+    :param usernames: usernames whose follow graph or posts have changed
+    :type usernames: strings
+    """
+    for username in usernames:
+        tasks.enqueue('counters.recount', {'username': username}, key=f'counters:{username}')
+
+
+@tasks.handler('counters.recount', batch_size=COUNTERS_BATCH_SIZE)
+def recount_profiles(payloads):
+    for profile in _correct(list(_profiles({payload['username'] for payload in payloads}))):
+        auth_cache.invalidate_profile(profile.user.username)
+
+
+def true_like_counts(post_ids):
+    """
+    Counts LikePost rows of a chunk of posts with one grouped query
+
+    :param post_ids: ids of the posts
+    :type post_ids: UUID[]
+    :returns: amount of likes by post id, posts without likes included
+    :rtype: { [post_id]: number }
+    """
+    counted = dict(
+        LikePost.objects.filter(post_id__in=post_ids)
+        .order_by()
+        .values_list('post_id')
+        .annotate(n=Count('id'))
+    )
+    return {post_id: counted.get(post_id, 0) for post_id in post_ids}
+
+
+def _like_drift(posts):
+    """:returns: no_of_likes minus the real amount of likes by id of those posts whose counter is off"""
+    counts = true_like_counts([post.id for post in posts])
+    drift = {}
+    for post in posts:
+        difference = post.no_of_likes - (counts[post.id] - likes.buffer.pending(post.id))
+        if difference:
+            drift[post.id] = difference
+    return drift
+
+
+def reconcile_likes(since=None, until=None, batch_size=LIKES_RECONCILE_BATCH_SIZE, pause=0, dry_run=False,
+                    settle=likes.LIKES_FLUSH_INTERVAL):
+    """
+    Compares Post.no_of_likes with the real amount of likes and corrects the drifted counters.
+    Posts are walked by (created_at, id) in chunks, every chunk is counted and corrected in its own
+    short transactions, so likes and posts are never locked for the whole run.
+    Likes other web processes still buffer are counted already but missing from the counter until
+    they flush, so drift is counted again after settle seconds and only drift which persisted is corrected,
+    by shifting the counter relatively, which keeps deltas flushed meanwhile
+
+    :param since: only posts created at or after since
+    :param until: only posts created before until
+    :type since: datetime or None
+    :type until: datetime or None
+    :param batch_size: amount of posts per chunk
+    :type batch_size: number
+    :param pause: seconds to sleep between chunks
+    :type pause: number
+    :param dry_run: only count drift, write nothing
+    :type dry_run: boolean
+    :param settle: seconds between the two counts of a drifted chunk, at least the flush interval of the like buffers
+    :type settle: number
+    :returns: amount of checked posts, of corrected posts and the summed absolute drift of their counters
+    :rtype: (number, number, number)
+    """
+    likes.buffer.flush()
+    posts = Post.objects.order_by('created_at', 'id').only('id', 'created_at', 'no_of_likes')
+    if since is not None:
+        posts = posts.filter(created_at__gte=since)
+    if until is not None:
+        posts = posts.filter(created_at__lt=until)
+
+    checked = 0
+    corrected = 0
+    drift = 0
+    last = None
+    while True:
+        chunk_posts = posts
+        if last is not None:
+            chunk_posts = posts.filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id))
+
+        with transaction.atomic():
+            chunk = list(chunk_posts[:batch_size])
+            if not chunk:
+                break
+            last = chunk[-1]
+            drifted = _like_drift(chunk)
+
+        if drifted:
+            time.sleep(settle)
+            with transaction.atomic():
+                again = _like_drift(list(posts.filter(id__in=list(drifted))))
+                persisted = {
+                    post_id: difference for post_id, difference in drifted.items() if again.get(post_id) == difference
+                }
+                if persisted and not dry_run:
+                    by_difference = {}
+                    for post_id, difference in persisted.items():
+                        by_difference.setdefault(difference, []).append(post_id)
+                    for difference, post_ids in by_difference.items():
+                        Post.objects.filter(id__in=post_ids).update(no_of_likes=F('no_of_likes') - difference)
+                    fragments.invalidate(*[('post', post_id) for post_id in persisted])
+            drifted = persisted
+
+        checked += len(chunk)
+        corrected += len(drifted)
+        drift += sum(abs(difference) for difference in drifted.values())
+        time.sleep(pause)
+    return checked, corrected, drift
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Post, FollowersCount
+from . import timeline
+
+# When False the feed is assembled straight from the posts table instead of the materialized timeline
+FEED_MATERIALIZED = getattr(settings, 'FEED_MATERIALIZED', True)
+FEED_PAGE_SIZE = getattr(settings, 'FEED_PAGE_SIZE', timeline.TIMELINE_PAGE_SIZE)
+# Posts index renders itself, the following pages are fetched from the feed API while scrolling
+FEED_FIRST_SCREEN_SIZE = getattr(settings, 'FEED_FIRST_SCREEN_SIZE', 10)
+
+# 'latest' orders by creation time, 'top' by the decaying like score maintained by core.ranking
+FEED_MODES = ('latest', 'top')
+
+_CURSOR_SALT = 'core.feed.cursor'
+
+
+def following_posts(username, before=None, limit=FEED_PAGE_SIZE):
+    """
+    Returns a page of posts of users followed by username with one indexed query
+
+    :param username: username of the viewer
+    :param before: post the previous page ended with, only older posts are returned
+    :param limit: maximal amount of posts to return
+    :type username: string
+    :type before: PostModel or None
+    :type limit: number
+    :returns: posts ordered from newest to oldest
+    :rtype: PostModel[]
+    """
+    followees = FollowersCount.objects.filter(follower=username).values('user')
+    posts = Post.objects.filter(user__in=followees)
+    if before is not None:
+        posts = posts.filter(
+            Q(created_at__lt=before.created_at)
+            | Q(created_at=before.created_at, id__lt=before.id)
+        )
+    return list(posts.order_by('-created_at', '-id')[:limit])
+
+
+def ranked_posts(username, before=None, limit=FEED_PAGE_SIZE):
+    """
+    Returns a page of posts of users followed by username, highest score first.
+    Only the best limit posts of every followee can make it onto the page, so post_user_score_idx
+    is walked per followee down to the score of its limit-th post and no other posts are read.
+    Pages are keyed by the current score of the last post, a post whose score changed
+    in between may show up on two pages or on none
+
+    :param username: username of the viewer
+    :param before: post the previous page ended with, only lower ranked posts are returned
+    :param limit: maximal amount of posts to return
+    :type username: string
+    :type before: PostModel or None
+    :type limit: number
+    :returns: posts ordered by score, then from newest to oldest
+    :rtype: PostModel[]
+    """
+    below = Q()
+    if before is not None:
+        # the redundant upper bound lets the index range start at the previous page
+        below = Q(score__lte=before.score) & (
+            Q(score__lt=before.score)
+            | Q(score=before.score, created_at__lt=before.created_at)
+            | Q(score=before.score, created_at=before.created_at, id__lt=before.id)
+        )
+    # correlated with the follow row, not the post, so SQLite uses it as the lower end of the index range
+    followee_best = (
+        Post.objects.filter(below, user=OuterRef('user__followers__user'))
+        .order_by('-score', '-created_at', '-id')
+        .values('score')[limit - 1:limit]
+    )
+    posts = Post.objects.filter(
+        below,
+        user__followers__follower=username,
+        # followees with fewer than limit posts have no threshold
+        score__gte=Coalesce(Subquery(followee_best), Value(float('-inf'))),
+    )
+    return list(posts.order_by('-score', '-created_at', '-id')[:limit])
+
+
+def page(user, before_id=None, limit=FEED_PAGE_SIZE, mode='latest'):
+    """
+    Returns one keyset paginated page of the home feed
+
+    :param user: viewer whose feed is read
+    :param before_id: id of the last post of the previous page
+    :param limit: maximal amount of posts on the page
+    :param mode: one of FEED_MODES
+    :type user: UserModel
+    :type before_id: string or None
+    :type limit: number
+    :type mode: string
+    :returns: posts of the page and id of the post the next page starts after,
+            None if there are no older posts
+    :rtype: (PostModel[], string or None)
+    :raises ValueError: if there is no post before_id, not even a deleted one
+    """
+    before = None
+    if before_id:
+        # the post a page ended with may have been deleted since, its position still holds
+        try:
+            before = Post.all_objects.filter(id=before_id).only('id', 'created_at', 'score').first()
+        except ValidationError:
+            before = None
+        if before is None:
+            raise ValueError(f'Unknown feed cursor post {before_id!r}')
+
+    # one extra row tells whether an older page exists
+    if mode == 'top':
+        posts = ranked_posts(user.username, before=before, limit=limit + 1)
+    elif FEED_MATERIALIZED:
+        posts = timeline.read(user, before=before, limit=limit + 1)
+        if len(posts) <= limit:
+            # timelines keep the newest TIMELINE_MAX_LENGTH posts, older ones are read from the posts table
+            last = posts[-1] if posts else before
+            posts += following_posts(user.username, before=last, limit=limit + 1 - len(posts))
+    else:
+        posts = following_posts(user.username, before=before, limit=limit + 1)
+
+    if len(posts) > limit:
+        return posts[:limit], str(posts[limit - 1].id)
+    return posts, None
+
+
+def parse_mode(value):
+    """
+    :param value: mode requested by the client
+    :type value: string or None
+    :returns: value if it is one of FEED_MODES, 'latest' otherwise
+    :rtype: string
+    """
+    return value if value in FEED_MODES else 'latest'
+
+
+def encode_cursor(before_id):
+    """
+    :param before_id: id of the last post of a page
+    :type before_id: string or None
+    :returns: opaque cursor of the following page, None if there is none
+    :rtype: string or None
+    """
+    if before_id is None:
+        return None
+    return signing.dumps(before_id, salt=_CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """
+    :param cursor: cursor returned by encode_cursor
+    :type cursor: string
+    :returns: id of the last post of the previous page
+    :rtype: string
+    :raises ValueError: if the cursor has not been issued by encode_cursor
+    """
+    try:
+        return signing.loads(cursor, salt=_CURSOR_SALT)
+    except signing.BadSignature:
+        raise ValueError(f'Invalid feed cursor {cursor!r}')
@@ -0,0 +1,108 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Cache alias rendered fragments and their version keys are stored in
+FRAGMENT_CACHE_ALIAS = getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'fragments')
+# Seconds a rendered fragment is kept, stale fragments are never read again and just age out
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Version scopes, every fragment key embeds the versions of the scopes it was rendered from:
+#   ('author', username) - posts and profile image of a user, bumped by upload, delete_post and settings
+#   ('post', post_id)    - likes and image variants of one post, bumped by like_post
+
+
+def _cache():
+    return caches[FRAGMENT_CACHE_ALIAS]
+
+
+def _version_key(scope):
+    kind, name = scope
+    return f'fragment-version:{kind}:{name}'
+
+
+def versions(*scopes):
+    """
+    :param scopes: (kind, name) pairs
+    :returns: current version of every scope, scopes without a version get one
+    :rtype: number[]
+    """
+    cache = _cache()
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    result = []
+    for key in keys:
+        if key not in found:
+            # versions start at the current time, an evicted version key never revives old fragments
+            found[key] = time.time_ns()
+            if not cache.add(key, found[key], timeout=None):
+                found[key] = cache.get(key, found[key])
+        result.append(found[key])
+    return result
+
+
+def bump(*scopes):
+    """Moves scopes to a new version, every fragment rendered from them is not read anymore"""
+    cache = _cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*scopes):
+    """
+    Bumps scopes once the current transaction commits, so a request reading the old rows
+    can not cache them under the new version
+    """
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def post_grid_key(author):
+    """
+    :param author: username whose posts are shown
+    :type author: string
+    :returns: cache key of the post grid of the profile page
+    :rtype: string
+    """
+    version, = versions(('author', author))
+    return f'fragment:post-grid:{author}:{version}'
+
+
+def feed_page_key(viewer, before, posts):
+    """
+    :param viewer: username of the logged in user, posts of the viewer render a delete link
+    :param before: cursor of the page, None for the first one
+    :param posts: posts on the page
+    :type viewer: string
+    :type before: string or None
+    :type posts: PostModel[]
+    :returns: cache key of one page of the feed
+    :rtype: string
+    """
+    scopes = [('post', post.id) for post in posts] + [('author', author) for author in sorted({post.user_id for post in posts})]
+    parts = [str(post.id) for post in posts] + [str(version) for version in versions(*scopes)]
+    digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return f'fragment:feed-page:{viewer}:{before or ""}:{digest}'
+
+
+def get_or_render(key, render):
+    """
+    :param key: fragment cache key
+    :param render: renders the fragment on a cache miss
+    :type key: string
+    :type render: () => string
+    :returns: rendered fragment
+    :rtype: string
+    """
+    cache = _cache()
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render()
+        cache.set(key, fragment, FRAGMENT_CACHE_TIMEOUT)
+    return fragment
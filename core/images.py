@@ -0,0 +1,136 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .models import Post, Profile
+from . import fragments, auth_cache, blobs, tasks
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of every generated variant, the original stays as uploaded
+IMAGE_VARIANTS = getattr(settings, 'IMAGE_VARIANTS', {'thumbnail': 320, 'feed': 1080})
+IMAGE_VARIANT_FORMAT = getattr(settings, 'IMAGE_VARIANT_FORMAT', 'WEBP')
+IMAGE_VARIANT_QUALITY = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+IMAGE_PIPELINE_WORKERS = getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2)
+
+_executor = None
+
+
+def render_variants(media_root, name):
+    """
+    Generates resized, re-encoded variants of an image. Runs in a worker process,
+    so it only touches files and never the database
+
+    :param media_root: MEDIA_ROOT of the project
+    :param name: path of the original image relative to media_root
+    :type media_root: string
+    :type name: string
+    :returns: paths of generated variants relative to media_root by variant name
+            and pixel widths of the original and every variant as they are displayed
+    :rtype: ({ [variant]: string }, { original: number, [variant]: number })
+    """
+    from PIL import Image, ImageOps
+
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    extension = IMAGE_VARIANT_FORMAT.lower()
+    os.makedirs(os.path.join(media_root, directory, 'variants'), exist_ok=True)
+
+    variants = {}
+    widths = {}
+    with Image.open(os.path.join(media_root, name)) as original:
+        original = ImageOps.exif_transpose(original)
+        widths['original'] = original.width
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+        for variant, size in IMAGE_VARIANTS.items():
+            image = original.copy()
+            image.thumbnail((size, size))
+            variant_name = os.path.join(directory, 'variants', f'{stem}_{variant}.{extension}')
+            image.save(os.path.join(media_root, variant_name), IMAGE_VARIANT_FORMAT, quality=IMAGE_VARIANT_QUALITY)
+            variants[variant] = variant_name
+            widths[variant] = image.width
+    return variants, widths
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_PIPELINE_WORKERS)
+    return _executor
+
+
+def _record(model, pk, fields, widths_field, stale, rendered):
+    variants, widths = rendered
+    # a retried task renders the same variants again, they are only retained once
+    unchanged = {field: variants[variant] for variant, field in fields.items()}
+    if model.objects.filter(pk=pk).exclude(**unchanged).update(**unchanged):
+        blobs.retain(*unchanged.values())
+    model.objects.filter(pk=pk).update(**{widths_field: widths})
+    if model is Profile:
+        # the update sends no signal, the cached profile of its owner still lacks the thumbnail
+        auth_cache.invalidate_profile(Profile.objects.filter(pk=pk).values_list('user__username', flat=True).first())
+    # cached fragments were rendered without the variants
+    fragments.bump(*stale)
+
+
+def _render_all(jobs):
+    """
+    Renders variants of (model, pk, name, fields, widths_field, stale) jobs in the process pool and records them.
+    Every job is recorded as soon as its variants are ready, the first error is raised once all are done
+    """
+    futures = [(job, _get_executor().submit(render_variants, str(settings.MEDIA_ROOT), job[2])) for job in jobs]
+    failed = None
+    for (model, pk, name, fields, widths_field, stale), future in futures:
+        try:
+            _record(model, pk, fields, widths_field, stale, future.result())
+        except Exception as error:
+            logger.exception('Generating image variants of %s %s failed', model.__name__, pk)
+            failed = failed or error
+    if failed is not None:
+        raise failed
+
+
+@tasks.handler('images.post_variants', batch_size=4 * IMAGE_PIPELINE_WORKERS)
+def generate_post_variants(payloads):
+    posts = Post.all_objects.filter(pk__in=[payload['post'] for payload in payloads], deleted_at__isnull=True)
+    _render_all([
+        (Post, post.pk, post.image.name, {'thumbnail': 'image_thumbnail', 'feed': 'image_feed'}, 'image_widths',
+         [('post', post.pk), ('author', post.user_id)])
+        for post in posts.only('pk', 'user', 'image') if post.image
+    ])
+
+
+@tasks.handler('images.profile_variants', batch_size=4 * IMAGE_PIPELINE_WORKERS)
+def generate_profile_variants(payloads):
+    profiles = Profile.objects.filter(pk__in=[payload['profile'] for payload in payloads]).select_related('user')
+    _render_all([
+        (Profile, profile.pk, profile.profileimg.name, {'thumbnail': 'profileimg_thumbnail'}, 'profileimg_widths',
+         [('author', profile.user.username)])
+        for profile in profiles if profile.profileimg
+    ])
+
+
+def process_post_image(post):
+    """
+    Queues generation of thumbnail and feed variants of a post image, see generate_post_variants
+
+    :param post: post with a freshly uploaded image
+    :type post: PostModel
+    """
+    if post.image:
+        tasks.enqueue('images.post_variants', {'post': str(post.pk)}, key=f'post-variants:{post.pk}')
+
+
+def process_profile_image(profile):
+    """
+    Queues generation of a thumbnail variant of a profile image, see generate_profile_variants
+
+    :param profile: profile with a freshly uploaded image
+    :type profile: ProfileModel
+    """
+    if profile.profileimg:
+        tasks.enqueue('images.profile_variants', {'profile': profile.pk}, key=f'profile-variants:{profile.pk}')
@@ -0,0 +1,183 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Profile, Post, LikePost, FollowersCount
+from . import fragments
+
+# Rows per iterator chunk on export and per bulk_create transaction on import
+TRANSFER_BATCH_SIZE = getattr(settings, 'TRANSFER_BATCH_SIZE', 1000)
+
+USER_FIELDS = (
+    'username', 'email', 'password', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+)
+USER_DATE_FIELDS = ('date_joined', 'last_login')
+PROFILE_FIELDS = ('bio', 'location', 'profileimg', 'profileimg_thumbnail', 'profileimg_widths')
+POST_FIELDS = (
+    'id', 'user', 'image', 'image_thumbnail', 'image_feed', 'image_widths', 'caption', 'created_at', 'no_of_likes',
+)
+
+
+def _users(chunk_size):
+    rows = (
+        User.objects.order_by('id')
+        .values(*USER_FIELDS, *(f'profile__{field}' for field in PROFILE_FIELDS))
+        .iterator(chunk_size=chunk_size)
+    )
+    previous = None
+    for row in rows:
+        # the join repeats users with several profiles, the first one is kept
+        if row['username'] == previous:
+            continue
+        previous = row['username']
+        record = {field: row[field] for field in USER_FIELDS}
+        if row['profile__profileimg'] is not None:
+            record['profile'] = {field: row[f'profile__{field}'] for field in PROFILE_FIELDS}
+        yield record
+
+
+def _exported(chunk_size):
+    # users first, every later record refers to them, likes refer to posts as well
+    yield 'user', _users(chunk_size)
+    yield 'post', Post.objects.order_by('id').values(*POST_FIELDS).iterator(chunk_size=chunk_size)
+    yield 'follow', FollowersCount.objects.order_by('id').values('follower', 'user').iterator(chunk_size=chunk_size)
+    likes = LikePost.objects.filter(post__deleted_at__isnull=True).order_by('id')
+    yield 'like', likes.values('post', 'user').iterator(chunk_size=chunk_size)
+
+
+def export(stream, chunk_size=TRANSFER_BATCH_SIZE, progress=None):
+    """
+    Writes every user with their profile, post, follow and like as one JSON object per line.
+    Rows are streamed chunk by chunk, memory use does not grow with the tables.
+    Counters, timelines and the search index are derived data and are not exported
+
+    :param stream: text stream the lines are written to
+    :type stream: file
+    :param chunk_size: rows fetched per query
+    :type chunk_size: number
+    :param progress: called with the record type and the amount of its written records after every chunk
+    :type progress: function or None
+    :returns: amount of written records
+    :rtype: number
+    """
+    total = 0
+    for kind, rows in _exported(chunk_size):
+        written = 0
+        for row in rows:
+            stream.write(json.dumps({'type': kind, **row}, cls=DjangoJSONEncoder) + '\n')
+            written += 1
+            if progress and written % chunk_size == 0:
+                progress(kind, written)
+        if progress:
+            progress(kind, written)
+        total += written
+    return total
+
+
+def _import_users(records):
+    users = []
+    for record in records:
+        fields = {field: record.get(field) for field in USER_FIELDS if field in record}
+        for field in USER_DATE_FIELDS:
+            if fields.get(field):
+                fields[field] = parse_datetime(fields[field])
+        users.append(User(**fields))
+    # existing users are kept, so a batch can be imported again
+    User.objects.bulk_create(users, ignore_conflicts=True)
+
+    ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+    with_profile = set(Profile.objects.filter(user_id__in=ids.values()).values_list('user_id', flat=True))
+    # counters stay zero until they are reconciled after the import
+    Profile.objects.bulk_create([
+        Profile(user_id=ids[record['username']], id_user=ids[record['username']], **record['profile'])
+        for record in records
+        if record.get('profile') is not None and ids[record['username']] not in with_profile
+    ])
+
+
+def _import_posts(records):
+    posts = [
+        Post(**{field: record[field] for field in POST_FIELDS if field not in ('user', 'created_at')},
+             user_id=record['user'], created_at=parse_datetime(record['created_at']))
+        for record in records
+    ]
+    Post.objects.bulk_create(posts, ignore_conflicts=True)
+    fragments.invalidate(*{('author', post.user_id) for post in posts})
+
+
+def _import_follows(records):
+    FollowersCount.objects.bulk_create(
+        [FollowersCount(follower_id=record['follower'], user_id=record['user']) for record in records],
+        ignore_conflicts=True,
+    )
+
+
+def _import_likes(records):
+    LikePost.objects.bulk_create(
+        [LikePost(post_id=record['post'], user_id=record['user']) for record in records],
+        ignore_conflicts=True,
+    )
+
+
+IMPORTERS = {
+    'user': _import_users,
+    'post': _import_posts,
+    'follow': _import_follows,
+    'like': _import_likes,
+}
+
+
+def import_lines(lines, batch_size=TRANSFER_BATCH_SIZE, skip=0, progress=None):
+    """
+    Reads lines written by export and bulk creates their records batch by batch, one transaction per batch.
+    Records which exist already are left alone, so an interrupted import can simply be run again
+
+    :param lines: JSON lines
+    :type lines: iterable of strings
+    :param batch_size: records per bulk_create and transaction
+    :type batch_size: number
+    :param skip: amount of leading lines which have been imported before
+    :type skip: number
+    :param progress: called with the record type, the amount of its imported records and the number
+                     of the last line which has been committed after every batch
+    :type progress: function or None
+    :returns: amount of imported records
+    :rtype: number
+    :raises ValueError: for lines which are no records written by export
+    """
+    kind = None
+    batch = []
+    imported = {}
+
+    def flush(committed_line):
+        if batch:
+            with transaction.atomic():
+                IMPORTERS[kind](batch)
+            imported[kind] = imported.get(kind, 0) + len(batch)
+            batch.clear()
+            if progress:
+                progress(kind, imported[kind], committed_line)
+
+    number = 0
+    for number, line in enumerate(lines, start=1):
+        if number <= skip or not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            raise ValueError(f'Line {number} is no JSON: {error}')
+        if record.get('type') not in IMPORTERS:
+            raise ValueError(f'Line {number} has the unknown record type {record.get("type")!r}')
+
+        if record['type'] != kind or len(batch) >= batch_size:
+            flush(number - 1)
+            kind = record['type']
+        batch.append(record)
+    flush(number)
+
+    return sum(imported.values())
@@ -0,0 +1,192 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction, DatabaseError
+from django.db.models import F
+
+from .models import Post
+from . import ranking
+
+logger = logging.getLogger(__name__)
+
+# Amount of buffered like changes that triggers a flush
+LIKES_FLUSH_THRESHOLD = getattr(settings, 'LIKES_FLUSH_THRESHOLD', 100)
+# Seconds after which buffered like changes are flushed regardless of their amount
+LIKES_FLUSH_INTERVAL = getattr(settings, 'LIKES_FLUSH_INTERVAL', 5)
+LIKES_BUFFER_SHARDS = getattr(settings, 'LIKES_BUFFER_SHARDS', 16)
+
+
+class LikeCounterBuffer:
+    """
+    Write-behind buffer of Post.no_of_likes changes.
+
+    LikePost rows stay the durable record of who liked what, the buffer only
+    batches the counter column: deltas are summed per post in sharded dictionaries
+    and written with one F() update per post on flush, so likers of a hot post
+    do not serialize on its row. The ranking score of the post is shifted in the same update.
+    """
+
+    def __init__(self, shards=LIKES_BUFFER_SHARDS, threshold=LIKES_FLUSH_THRESHOLD,
+                 interval=LIKES_FLUSH_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self._shards = [defaultdict(int) for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._size = 0
+        self._size_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # changes taken out of the shards which are being written right now
+        self._inflight = {}
+        self._last_flush = time.monotonic()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+
+    def _index(self, post_id):
+        return hash(str(post_id)) % len(self._shards)
+
+    def add(self, post_id, delta):
+        """
+        Buffers a like (delta=1) or an unlike (delta=-1) of a post, flushing when due
+
+        :param post_id: id of the liked post
+        :param delta: change of the like counter
+        :type post_id: UUID
+        :type delta: number
+        """
+        self._start_flusher()
+        # the shard is looked up under its lock, drain swaps shards out
+        index = self._index(post_id)
+        with self._locks[index]:
+            self._shards[index][str(post_id)] += delta
+        with self._size_lock:
+            self._size += 1
+            due = self._size >= self.threshold or time.monotonic() - self._last_flush >= self.interval
+        if due:
+            try:
+                self.flush()
+            except DatabaseError:
+                # changes are back in the buffer, the next flush retries them
+                logger.exception('Flushing buffered likes failed')
+
+    def _start_flusher(self):
+        """
+        Starts a daemon thread flushing every interval seconds, so the last like on a quiet post
+        does not wait for the next like to be written
+        """
+        if self._flusher is not None or not getattr(settings, 'LIKES_FLUSH_THREAD', True):
+            return
+        with self._flusher_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='likes-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            if time.monotonic() - self._last_flush < self.interval:
+                # a like has flushed in the meantime
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing buffered likes failed')
+            finally:
+                close_old_connections()
+
+    def pending(self, post_id):
+        """
+        :returns: buffered change of the like counter of a post, which is not in the database yet
+        :rtype: number
+        """
+        index = self._index(post_id)
+        with self._locks[index]:
+            return self._shards[index].get(str(post_id), 0) + self._inflight.get(str(post_id), 0)
+
+    def merge_pending(self, posts):
+        """
+        Adds buffered changes to no_of_likes of posts read from the database
+
+        :param posts: posts to display
+        :type posts: PostModel[]
+        :returns: the same posts as a list
+        :rtype: PostModel[]
+        """
+        posts = list(posts)
+        for post in posts:
+            post.no_of_likes += self.pending(post.id)
+        return posts
+
+    def drain(self):
+        """
+        Takes all buffered changes out of the buffer
+
+        :returns: changes of like counters by post id
+        :rtype: { [post_id]: number }
+        """
+        drained = defaultdict(int)
+        for index, lock in enumerate(self._locks):
+            with lock:
+                shard = self._shards[index]
+                self._shards[index] = defaultdict(int)
+            for post_id, delta in shard.items():
+                drained[post_id] += delta
+        with self._size_lock:
+            self._size = 0
+            self._last_flush = time.monotonic()
+        return {post_id: delta for post_id, delta in drained.items() if delta}
+
+    def flush(self):
+        """
+        Writes all buffered changes to Post.no_of_likes and Post.score with F() expressions.
+        If writing fails, the changes are put back into the buffer
+
+        :returns: amount of updated posts
+        :rtype: number
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            # another thread is flushing already
+            return 0
+        try:
+            self._inflight = drained = self.drain()
+            if not drained:
+                return 0
+            try:
+                at = ranking.decay_time()
+                with transaction.atomic():
+                    created = {
+                        str(post_id): created_at
+                        for post_id, created_at in Post.objects.filter(id__in=list(drained)).values_list('id', 'created_at')
+                    }
+                    for post_id, delta in drained.items():
+                        if post_id not in created:
+                            continue
+                        Post.objects.filter(id=post_id).update(
+                            no_of_likes=F('no_of_likes') + delta,
+                            score=F('score') + delta * ranking.weight(created[post_id], at),
+                        )
+            except Exception:
+                for post_id, delta in drained.items():
+                    index = self._index(post_id)
+                    with self._locks[index]:
+                        self._shards[index][post_id] += delta
+                raise
+            finally:
+                self._inflight = {}
+            return len(drained)
+        finally:
+            self._flush_lock.release()
+
+
+buffer = LikeCounterBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        pass
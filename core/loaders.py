@@ -0,0 +1,98 @@
+from django.db.models import Q
+
+from .models import Profile
+
+# Keys a profile can be looked up by and the lookups resolving them
+_LOOKUPS = {
+    'username': 'user__username__in',
+    'user_id': 'user_id__in',
+    'id_user': 'id_user__in',
+}
+
+
+class ProfileLoader:
+    """
+    Batching loader of profiles with their users, scoped to one request.
+    Keys are collected with queue() and resolved together in one IN query the first time
+    a profile is read. Resolved profiles, and keys without one, are kept in an identity map,
+    so no profile is fetched twice within a request
+    """
+
+    def __init__(self):
+        self._loaded = {kind: {} for kind in _LOOKUPS}
+        self._queued = {kind: set() for kind in _LOOKUPS}
+
+    def add(self, profile):
+        """Puts an already loaded profile into the identity map"""
+        self._loaded['username'][profile.user.username] = profile
+        self._loaded['user_id'][profile.user_id] = profile
+        self._loaded['id_user'][profile.id_user] = profile
+
+    def queue(self, usernames=(), user_ids=(), id_users=()):
+        """Collects keys to resolve with the next dispatch"""
+        for kind, values in (('username', usernames), ('user_id', user_ids), ('id_user', id_users)):
+            self._queued[kind].update(value for value in values if value not in self._loaded[kind])
+
+    def dispatch(self):
+        """Resolves every queued key in one query"""
+        condition = Q()
+        for kind, values in self._queued.items():
+            if values:
+                condition |= Q(**{_LOOKUPS[kind]: values})
+        if not condition:
+            return
+
+        for profile in Profile.objects.filter(condition).select_related('user'):
+            self.add(profile)
+        # remember keys without a profile, they are not looked up again
+        for kind, values in self._queued.items():
+            for value in values:
+                self._loaded[kind].setdefault(value, None)
+            values.clear()
+
+    def get(self, **key):
+        """
+        :param key: one of username, user_id or id_user
+        :returns: profile with its user
+        :rtype: ProfileModel
+        :raises Profile.DoesNotExist: if there is no such profile
+        """
+        (kind, value), = key.items()
+        self.queue(**{_plural(kind): [value]})
+        self.dispatch()
+        profile = self._loaded[kind][value]
+        if profile is None:
+            raise Profile.DoesNotExist(f'Profile with {kind} {value} does not exist')
+        return profile
+
+    def get_many(self, **keys):
+        """
+        :param keys: one of usernames, user_ids or id_users
+        :returns: profiles in the order of the keys, keys without a profile are left out
+        :rtype: ProfileModel[]
+        """
+        (kind, values), = keys.items()
+        values = list(values)
+        self.queue(**{kind: values})
+        self.dispatch()
+        loaded = self._loaded[_singular(kind)]
+        return [loaded[value] for value in values if loaded[value] is not None]
+
+
+def _plural(kind):
+    return kind + 's'
+
+
+def _singular(kind):
+    return kind[:-1]
+
+
+def profile_loader(request):
+    """
+    :returns: the profile loader of request, created with the first call
+    :rtype: ProfileLoader
+    """
+    loader = getattr(request, '_profile_loader', None)
+    if loader is None:
+        loader = request._profile_loader = ProfileLoader()
+    return loader
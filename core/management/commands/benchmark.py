@@ -0,0 +1,61 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives the views of core/urls.py with concurrent requests and reports latency percentiles, '
+        'throughput and queries per request as JSON. Writes to the database, run it against seeded copies only'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes', nargs='+', default=list(benchmark.ROUTES), choices=benchmark.ROUTES)
+        parser.add_argument('--requests', type=int, default=200, help='requests per route')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='file the JSON report is written to')
+        parser.add_argument('--compare', help='JSON report of a previous run to compare with')
+
+    def handle(self, *args, **options):
+        try:
+            workload = benchmark.Workload(options['seed'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'routes': {},
+        }
+        # the test client talks as 'testserver', budgets are reported instead of enforced
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], QUERY_BUDGET_STRICT=False):
+            for route in options['routes']:
+                report['routes'][route] = benchmark.run_route(
+                    route, workload, options['requests'], options['concurrency'],
+                )
+                self.stderr.write(f'{route}: {report["routes"][route]}')
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                report['changes'] = benchmark.compare(json.load(file), report)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            return None
@@ -0,0 +1,46 @@
+import json
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from core import passwords
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures hashes per second of every configured password hasher on one thread and on '
+        'PASSWORD_HASHING_WORKERS threads, to weigh iteration counts against sign in capacity'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=2.0, help='seconds each measurement hashes for')
+        parser.add_argument('--threads', type=int, default=passwords.PASSWORD_HASHING_WORKERS)
+        parser.add_argument('--output', help='file the JSON report is written to')
+
+    def handle(self, *args, **options):
+        report = {'threads': options['threads'], 'hashers': {}}
+        for hasher in get_hashers():
+            # PASSWORD_HASHERS may list hashers whose library is not installed
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError as error:
+                    self.stdout.write(f'{hasher.algorithm}: skipped, {error}')
+                    continue
+
+            single = passwords.measure(hasher, options['duration'], threads=1)
+            parallel = passwords.measure(hasher, options['duration'], threads=options['threads'])
+            report['hashers'][hasher.algorithm] = {
+                'hashes_per_second': round(single, 1),
+                'parallel_hashes_per_second': round(parallel, 1),
+                'milliseconds_per_hash': round(1000 / single, 2) if single else None,
+            }
+            self.stdout.write(
+                f'{hasher.algorithm}: {single:.1f} hashes/s on 1 thread, '
+                f'{parallel:.1f} hashes/s on {options["threads"]} threads'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Preferred hasher: {get_hashers()[0].algorithm}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import ranking
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the ranking score of every post from its likes, decayed to the current interval. '
+        'Likes web processes still buffer are counted twice, run it while few posts are liked. '
+        'Workers of run_tasks only rescale the scores from one interval to the next'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ranking.FEED_SCORE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        checked, updated = ranking.redecay(options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} posts, updated {updated} scores'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core import blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves post and profile images stored before content addressed storage to their sharded blob names, '
+        'deletes byte identical duplicates and rebuilds blob reference counts. Can be run again after an interruption'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=blobs.BLOB_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model, fields in blobs.BLOB_FIELDS.items():
+            for field in fields:
+                moved, missing, freed = blobs.dedupe(model, field, options['batch_size'])
+                self.stdout.write(
+                    f'{model.__name__}.{field}: moved {moved} files, freed {freed / 1024 / 1024:.1f} MB, '
+                    f'{missing} files missing'
+                )
+
+        referenced = blobs.rebuild_references(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Counted references of {referenced} blobs'))
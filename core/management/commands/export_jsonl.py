@@ -0,0 +1,34 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams users with profiles, posts, follows and likes as JSON lines, see import_jsonl. '
+        'Progress is reported on stderr, so the lines can be written to stdout'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='file to write, - for stdout')
+        parser.add_argument('--batch-size', type=int, default=jsonl.TRANSFER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(kind, written):
+            elapsed = time.perf_counter() - started
+            self.stderr.write(f'{kind}: {written} records exported, {written / max(elapsed, 1e-9):.0f} records/s')
+
+        if options['output'] == '-':
+            total = jsonl.export(sys.stdout, chunk_size=options['batch_size'], progress=progress)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                total = jsonl.export(stream, chunk_size=options['batch_size'], progress=progress)
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {total} records in {time.perf_counter() - started:.1f}s'
+        ))
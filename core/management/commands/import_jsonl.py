@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jsonl, counters, search_index, timeline, blobs, ranking
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk imports JSON lines written by export_jsonl in batches of one transaction each. '
+        'The last committed line of a file is kept in <file>.checkpoint, an interrupted import resumes there. '
+        'Counters, search index and timelines are rebuilt afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to import, - for stdin')
+        parser.add_argument('--batch-size', type=int, default=jsonl.TRANSFER_BATCH_SIZE)
+        parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the first line')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='do not rebuild counters, search index and timelines')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = None if path == '-' else f'{path}.checkpoint'
+        skip = 0
+        if checkpoint and os.path.exists(checkpoint) and not options['restart']:
+            with open(checkpoint) as file:
+                skip = int(file.read() or 0)
+            self.stdout.write(f'Resuming after line {skip}')
+
+        started = time.perf_counter()
+
+        def progress(kind, imported, committed_line):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{kind}: {imported} records imported, {imported / max(elapsed, 1e-9):.0f} records/s')
+            if checkpoint:
+                with open(checkpoint, 'w') as file:
+                    file.write(str(committed_line))
+
+        try:
+            if path == '-':
+                total = jsonl.import_lines(sys.stdin, options['batch_size'], skip, progress)
+            else:
+                with open(path, encoding='utf-8') as lines:
+                    total = jsonl.import_lines(lines, options['batch_size'], skip, progress)
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(f'Imported {total} records in {time.perf_counter() - started:.1f}s')
+
+        if not options['skip_derived']:
+            checked, corrected = counters.reconcile()
+            self.stdout.write(f'Reconciled counters of {checked} profiles')
+            checked, corrected, _ = counters.reconcile_likes()
+            self.stdout.write(f'Reconciled like counters of {checked} posts')
+            scored, _ = ranking.redecay()
+            self.stdout.write(f'Scored {scored} posts')
+            self.stdout.write(f'Counted references of {blobs.rebuild_references()} blobs')
+            for user in User.objects.order_by('id').iterator(chunk_size=timeline.TIMELINE_BATCH_SIZE):
+                search_index.index_user(user)
+                timeline.rebuild(user)
+            self.stdout.write('Rebuilt search index and timelines')
+
+        self.stdout.write(self.style.SUCCESS('Import finished'))
@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the username search index'
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for user in User.objects.order_by('id').iterator(chunk_size=search_index.SEARCH_BATCH_SIZE):
+            search_index.index_user(user)
+            indexed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} users'))
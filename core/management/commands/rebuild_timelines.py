@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds materialized home timelines from the follow graph and posts tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild timelines of these users')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        rebuilt = 0
+        entries = 0
+        for user in users.iterator(chunk_size=timeline.TIMELINE_BATCH_SIZE):
+            entries += timeline.rebuild(user)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} timelines with {entries} entries'))
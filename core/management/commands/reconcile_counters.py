@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes follower, following and post counters of every profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=counters.COUNTERS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        checked, corrected = counters.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} profiles, corrected {corrected}'))
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core import counters, likes
+
+
+def _moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{value!r} is no date or datetime')
+        moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes like counters of posts from their likes chunk by chunk in creation order '
+        'and reports how far the stored counters drifted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=_moment, help='only posts created at or after this date or datetime')
+        parser.add_argument('--until', type=_moment, help='only posts created before this date or datetime')
+        parser.add_argument('--days', type=int, help='only posts created within the last days')
+        parser.add_argument('--batch-size', type=int, default=counters.LIKES_RECONCILE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between chunks')
+        parser.add_argument('--dry-run', action='store_true', help='report drift without correcting it')
+        parser.add_argument('--settle', type=float, default=likes.LIKES_FLUSH_INTERVAL,
+                            help='seconds to wait before drift is counted again, likes buffered by web processes are flushed meanwhile')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if options['days'] is not None:
+            since = timezone.now() - timedelta(days=options['days'])
+
+        checked, corrected, drift = counters.reconcile_likes(
+            since=since,
+            until=options['until'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+            settle=options['settle'],
+        )
+        verb = 'drifted' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} posts, {verb} {corrected} by {drift} likes in total'
+        ))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core import tasks, auth_cache, fragments
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background tasks: image variants, cleanup of deleted posts, counters and timelines. '
+        'Retries failed tasks with exponential backoff'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='amount of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=tasks.TASKS_POLL_INTERVAL,
+                            help='seconds an idle thread waits before looking for due tasks again')
+        parser.add_argument('--metrics-interval', type=float, default=tasks.TASKS_METRICS_INTERVAL,
+                            help='seconds between queue depth reports')
+        parser.add_argument('--once', action='store_true', help='run due tasks in this thread and exit')
+        parser.add_argument('--stats', action='store_true', help='print queue depths and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(tasks.depth(), indent=2, sort_keys=True))
+            return
+
+        # tasks drop cached profiles and fragments, web processes never see that in a cache of the worker process
+        local = [
+            alias for alias in (auth_cache.AUTH_CACHE_ALIAS, fragments.FRAGMENT_CACHE_ALIAS)
+            if isinstance(caches[alias], LocMemCache)
+        ]
+        if local:
+            raise CommandError(
+                f'The {", ".join(map(repr, local))} cache is local to this process, web processes would keep '
+                'serving stale profiles and pages. Point DEFAULT_CACHE_BACKEND and FRAGMENT_CACHE_BACKEND '
+                'at a shared cache, e.g. memcached, redis or django.core.cache.backends.filebased.FileBasedCache'
+            )
+
+        if options['once']:
+            ran = tasks.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} tasks'))
+            return
+
+        self.stdout.write(f'Running tasks in {options["threads"]} threads, stop with Ctrl-C')
+        try:
+            tasks.work(options['threads'], options['poll_interval'], options['metrics_interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
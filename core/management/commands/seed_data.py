@@ -0,0 +1,122 @@
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Profile, Post, LikePost, FollowersCount
+from core import counters, search_index, timeline
+
+BATCH_SIZE = 1000
+SEED_IMAGES_DIR = 'post_images/seed'
+SEED_IMAGES = 8
+USERNAME_PREFIX = 'seed_user_'
+
+
+def power_law(rng, alpha, maximum):
+    """Draws an integer in [1, maximum] from a Pareto distribution"""
+    return min(int(rng.paretovariate(alpha)), maximum)
+
+
+class Command(BaseCommand):
+    help = (
+        'Deterministically seeds users with profiles, a power-law follow graph, posts with images and likes. '
+        'Run it against an empty or disposable database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts-per-user', type=float, default=5, help='average amount of posts per user')
+        parser.add_argument('--likes-per-post', type=float, default=3, help='average amount of likes per post')
+        parser.add_argument('--follow-alpha', type=float, default=1.2,
+                            help='Pareto shape of follows per user and of popularity, lower is more skewed')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--password', default='seedpassword', help='password of every seeded user')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user_count = options['users']
+        alpha = options['follow_alpha']
+        start = datetime(2023, 11, 1, tzinfo=timezone.utc)
+
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('The database has been seeded already')
+
+        images = self.write_images(rng)
+
+        # one hash for everybody, hashing every password would dominate seeding time
+        password = make_password(options['password'], salt='seeddata')
+        usernames = [f'{USERNAME_PREFIX}{i}' for i in range(user_count)]
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=name, email=f'{name}@example.com', password=password) for name in usernames],
+                batch_size=BATCH_SIZE,
+            )
+        users = dict(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('username', 'id'))
+        with transaction.atomic():
+            Profile.objects.bulk_create(
+                [Profile(user_id=users[name], id_user=users[name], bio=f'Bio of {name}') for name in usernames],
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(f'Seeded {user_count} users')
+
+        # popularity follows a power law too: low ranks attract most followers
+        weights = [1 / (rank + 1) ** alpha for rank in range(user_count)]
+        follows = []
+        for follower in usernames:
+            amount = power_law(rng, alpha, user_count - 1)
+            followees = {usernames[i] for i in rng.choices(range(user_count), weights=weights, k=amount)}
+            followees.discard(follower)
+            follows.extend(FollowersCount(follower_id=follower, user_id=followee) for followee in sorted(followees))
+        with transaction.atomic():
+            FollowersCount.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+        self.stdout.write(f'Seeded {len(follows)} follows')
+
+        posts = []
+        for name in usernames:
+            for _ in range(round(rng.expovariate(1 / options['posts_per_user']))):
+                posts.append(Post(
+                    id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    user_id=name,
+                    image=rng.choice(images),
+                    caption=f'Post of {name}',
+                    created_at=start + timedelta(seconds=rng.randrange(30 * 24 * 60 * 60)),
+                ))
+
+        likes = []
+        for post in posts:
+            likers = {rng.randrange(user_count) for _ in range(int(rng.expovariate(1 / options['likes_per_post'])))}
+            post.no_of_likes = len(likers)
+            likes.extend(LikePost(post=post, user_id=usernames[i]) for i in sorted(likers))
+        with transaction.atomic():
+            Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+            LikePost.objects.bulk_create(likes, batch_size=BATCH_SIZE)
+        self.stdout.write(f'Seeded {len(posts)} posts and {len(likes)} likes')
+
+        # derived data is rebuilt from what has been seeded
+        counters.reconcile()
+        for user in User.objects.filter(username__startswith=USERNAME_PREFIX).iterator(chunk_size=BATCH_SIZE):
+            search_index.index_user(user)
+            timeline.rebuild(user)
+
+        self.stdout.write(self.style.SUCCESS('Seeding finished'))
+
+    def write_images(self, rng):
+        from PIL import Image
+
+        directory = os.path.join(settings.MEDIA_ROOT, SEED_IMAGES_DIR)
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for i in range(SEED_IMAGES):
+            name = f'{SEED_IMAGES_DIR}/seed_{i}.png'
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            if not os.path.exists(path):
+                Image.new('RGB', (1200, 900), color).save(path)
+            names.append(name)
+        return names
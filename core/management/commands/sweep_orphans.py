@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core import cleanup
+
+
+class Command(BaseCommand):
+    help = (
+        'Purges deleted posts whose cleanup job did not run, with their likes and timeline entries, '
+        'and deletes post and profile images nothing refers to. Works in small batches which commit on their own'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=cleanup.CLEANUP_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between batches')
+        parser.add_argument('--grace', type=float, default=cleanup.CLEANUP_FILE_GRACE,
+                            help='files younger than grace seconds are kept, their upload might still be in progress')
+        parser.add_argument('--skip-files', action='store_true', help='do not look for orphaned files')
+
+    def handle(self, *args, **options):
+        purged, likes = cleanup.sweep_deleted_posts(options['batch_size'], options['pause'])
+        self.stdout.write(f'Purged {purged} deleted posts with {likes} likes')
+
+        if not options['skip_files']:
+            checked, deleted = cleanup.sweep_orphaned_files(options['grace'], options['batch_size'], options['pause'])
+            self.stdout.write(f'Checked {checked} files, deleted {deleted} orphaned files')
+
+        self.stdout.write(self.style.SUCCESS('Sweep finished'))
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routers import REPLICA_DATABASE
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the default SQLite database into the replica file with the SQLite online backup API. '
+        'Writers are not blocked while it runs, readers of the replica see the new copy once it is complete'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='keep copying every interval seconds')
+        parser.add_argument('--pages', type=int, default=1024, help='pages copied per backup step')
+
+    def handle(self, *args, **options):
+        if REPLICA_DATABASE not in connections.settings:
+            raise CommandError(f'No {REPLICA_DATABASE!r} database is configured, set DATABASE_REPLICA_NAME')
+        source = connections.settings[DEFAULT_DB_ALIAS]
+        replica = connections.settings[REPLICA_DATABASE]
+        if source['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica only copies SQLite databases, replicate other databases with their own tools')
+
+        while True:
+            started = time.perf_counter()
+            self.copy(str(source['NAME']), str(replica['NAME']), options['pages'])
+            self.stdout.write(f'Replica synced in {time.perf_counter() - started:.3f}s')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, replica_name, pages):
+        source = sqlite3.connect(source_name)
+        replica = sqlite3.connect(replica_name)
+        try:
+            source.backup(replica, pages=pages)
+        finally:
+            replica.close()
+            source.close()
@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+# How file bodies leave the server:
+#   None               - python streams the file, WSGI servers use sendfile() through wsgi.file_wrapper
+#   'x-accel-redirect' - nginx sends the file, MEDIA_ACCEL_REDIRECT_PREFIX is its internal location
+#   'x-sendfile'       - apache mod_xsendfile / lighttpd send the file by its absolute path
+MEDIA_SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+MEDIA_ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Uploads under these directories never change once written, so clients may cache them forever
+MEDIA_IMMUTABLE_DIRS = getattr(settings, 'MEDIA_IMMUTABLE_DIRS', ('post_images', 'profile_images'))
+MEDIA_IMMUTABLE_MAX_AGE = getattr(settings, 'MEDIA_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60)
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 60 * 60)
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileSlice:
+    """Reads at most length bytes of a file starting at offset, used for Range responses"""
+
+    block_size = 64 * 1024
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.file.seek(offset)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _parse_range(header, size):
+    """
+    :returns: first and last byte of a single byte range, None if header is not a single range
+    :raises ValueError: if the range can not be satisfied
+    """
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range, the last N bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    if first > last or first >= size:
+        raise ValueError(header)
+    return first, last
+
+
+def _cache_control(path):
+    if path.split('/', 1)[0] in MEDIA_IMMUTABLE_DIRS:
+        return f'public, max-age={MEDIA_IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={MEDIA_MAX_AGE}'
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serves an uploaded file out of MEDIA_ROOT with conditional request, Range and caching support
+
+    :param request: GET or HEAD request, may carry If-None-Match, If-Modified-Since, Range and If-Range headers
+    :param path: path of the file relative to MEDIA_ROOT
+    :type path: string
+    :returns: 200 or 206 with the file, 304 if the client copy is fresh, 416 for unsatisfiable ranges
+    :raises Http404: if there is no such file
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File does not exist')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('File does not exist')
+
+    size = stat_result.st_size
+    etag = quote_etag(f'{stat_result.st_mtime_ns:x}-{size:x}')
+    last_modified = int(stat_result.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        if isinstance(not_modified, HttpResponseNotModified):
+            not_modified['Cache-Control'] = _cache_control(path)
+        return not_modified
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_SENDFILE_BACKEND:
+        # the front server sends the body and handles Range requests itself
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_SENDFILE_BACKEND == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = MEDIA_ACCEL_REDIRECT_PREFIX + path
+        else:
+            response['X-Sendfile'] = fullpath
+    elif byte_range is not None:
+        first, last = byte_range
+        length = last - first + 1
+        response = FileResponse(_FileSlice(open(fullpath, 'rb'), first, length), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = length
+    else:
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        response['Content-Length'] = size
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = _cache_control(path)
+    response['Accept-Ranges'] = 'bytes'
+    return response
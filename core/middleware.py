@@ -0,0 +1,283 @@
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import routers, auth_cache
+from .loaders import profile_loader
+
+logger = logging.getLogger('core.metrics')
+
+_current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Counters collected while one request is handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.wall_time = 0.0
+        self.url_name = None
+        # render time by template name and by 'template#block', nested renders are included in their parents
+        self.template_timings = {}
+        self._template_depth = 0
+
+    def add_template_timing(self, label, seconds):
+        self.template_timings[label] = self.template_timings.get(label, 0.0) + seconds
+
+    def as_dict(self):
+        return {
+            'url_name': self.url_name,
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 3),
+            'template_ms': round(self.template_time * 1000, 3),
+            'templates_ms': {label: round(seconds * 1000, 3) for label, seconds in self.template_timings.items()},
+            'wall_ms': round(self.wall_time * 1000, 3),
+        }
+
+
+def current_metrics():
+    """
+    :returns: metrics of the request handled right now, None outside of a request
+    :rtype: RequestMetrics or None
+    """
+    return _current_metrics.get()
+
+
+def _timed_execute(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def _add_timed_execute(connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def install_query_timing():
+    """
+    Adds a query timing execute wrapper to every database connection.
+    Connections are thread local while the metrics travel in a context variable, so queries
+    which sync_to_async runs in another thread are still counted for the right request
+    """
+    connection_created.connect(_add_timed_execute, dispatch_uid='core.middleware.query_timing')
+    for connection in connections.all(initialized_only=True):
+        _add_timed_execute(connection)
+
+
+def _time_node(node_class, label):
+    """Wraps render of a template node class, its render time is recorded under label(node, context)"""
+    if getattr(node_class.render, 'timed', False):
+        return
+    original_render = node_class.render
+
+    def render(self, context):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return original_render(self, context)
+
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            metrics.add_template_timing(f'{self.origin.template_name}#{label(self)}', time.perf_counter() - start)
+
+    render.timed = True
+    node_class.render = render
+
+
+def install_template_timing():
+    """
+    Wraps Template.render so time spent rendering templates is added to the current request metrics.
+    Nested renders (include, extends) are only counted once in template_time, by the outermost template.
+    Every template, {% block %} and {% fragment %} is timed on its own as well
+    """
+    from django.template.base import Template
+    from django.template.loader_tags import BlockNode
+    from .templatetags.fragments import FragmentNode
+
+    _time_node(BlockNode, lambda node: node.name)
+    _time_node(FragmentNode, lambda node: f'fragment {node.key.token}')
+
+    if getattr(Template.render, 'timed', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return original_render(self, context)
+
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.add_template_timing(self.name, elapsed)
+            metrics._template_depth -= 1
+            if metrics._template_depth == 0:
+                metrics.template_time += elapsed
+
+    render.timed = True
+    Template.render = render
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, database time, template render time and wall time of every request,
+    tagged by the URL name it resolved to.
+
+    QUERY_BUDGETS maps URL names to the maximal amount of queries a request may issue.
+    Exceeding a budget logs a warning, or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT
+    is on, which the test runner does. With REQUEST_METRICS_HEADERS the metrics are also
+    sent back in a Server-Timing header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        metrics.wall_time = time.perf_counter() - start
+        if request.resolver_match is not None:
+            metrics.url_name = request.resolver_match.url_name
+
+        logger.debug('request metrics %s', metrics.as_dict())
+        if getattr(settings, 'REQUEST_METRICS_HEADERS', False):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.3f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.3f}',
+                *(
+                    f'tpl-{index};dur={seconds * 1000:.3f};desc="{label}"'
+                    for index, (label, seconds) in enumerate(metrics.template_timings.items())
+                ),
+                f'total;dur={metrics.wall_time * 1000:.3f}',
+            ])
+        self.check_budget(metrics)
+        return response
+
+    def check_budget(self, metrics):
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(metrics.url_name)
+        if budget is None or metrics.queries <= budget:
+            return
+
+        message = f'View {metrics.url_name} issued {metrics.queries} queries, its budget is {budget}'
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={'metrics': metrics.as_dict()})
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes the reads of views listed in REPLICA_VIEWS by URL name to the read replica, see core.routers.
+    Sessions and the logged in user are read before the view resolves, from the default database
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.replica_views = frozenset(getattr(settings, 'REPLICA_VIEWS', ()))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = routers.use_replica(False)
+        try:
+            return self.get_response(request)
+        finally:
+            routers.reset_replica(token)
+
+    async def __acall__(self, request):
+        token = routers.use_replica(False)
+        try:
+            return await self.get_response(request)
+        finally:
+            routers.reset_replica(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.url_name in self.replica_views:
+            if hasattr(request, 'user'):
+                # resolve the lazy user from the default database first, a replica lagging behind
+                # might not know a session which has just been created
+                request.user.is_authenticated
+            routers.use_replica(True)
+
+
+def _get_user(request):
+    if not hasattr(request, '_cached_user'):
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            profile = auth_cache.get_profile(user)
+            if profile is not None:
+                profile_loader(request).add(profile)
+        request._cached_user = user
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware which puts the cached profile of the logged in user into the profile loader
+    of the request. Together with CachedModelBackend and cached sessions a page for a logged in user
+    reads the session, the user and its profile without a query
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _get_user(request))
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.1 on 2026-10-18 01:16
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Profile = apps.get_model('core', 'Profile')
+    Post = apps.get_model('core', 'Post')
+    FollowersCount = apps.get_model('core', 'FollowersCount')
+
+    def counts(queryset, field, usernames):
+        return dict(
+            queryset.filter(**{f'{field}__in': usernames})
+            .order_by()
+            .values_list(field)
+            .annotate(n=Count('id'))
+        )
+
+    # walk profiles in chunks so large tables are never loaded at once
+    last_id = 0
+    while True:
+        chunk = list(Profile.objects.filter(id__gt=last_id).order_by('id').select_related('user')[:1000])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        usernames = [profile.user.username for profile in chunk]
+        followers = counts(FollowersCount.objects, 'user', usernames)
+        following = counts(FollowersCount.objects, 'follower', usernames)
+        posts = counts(Post.objects, 'user', usernames)
+        for profile in chunk:
+            profile.followers_count = followers.get(profile.user.username, 0)
+            profile.following_count = following.get(profile.user.username, 0)
+            profile.posts_count = posts.get(profile.user.username, 0)
+        Profile.objects.bulk_update(chunk, ['followers_count', 'following_count', 'posts_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='posts_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
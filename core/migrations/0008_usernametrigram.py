@@ -0,0 +1,49 @@
+# Generated by Django 4.2.1 on 2026-10-18 01:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_usernames(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UsernameTrigram = apps.get_model('core', 'UsernameTrigram')
+
+    # walk users in chunks so large tables are never loaded at once
+    last_id = 0
+    while True:
+        chunk = list(User.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'username')[:1000])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+
+        rows = []
+        for user_id, username in chunk:
+            padded = f'  {username.lower()}  '
+            for trigram in {padded[i:i + 3] for i in range(len(padded) - 2)}:
+                rows.append(UsernameTrigram(user_id=user_id, trigram=trigram))
+        UsernameTrigram.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0007_profile_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='username_trigrams', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usernametrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'user'), name='unique_username_trigram'),
+        ),
+        migrations.RunPython(index_usernames, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.1 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_usernametrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_feed',
+            field=models.ImageField(blank=True, upload_to='post_images'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, upload_to='post_images'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profileimg_thumbnail',
+            field=models.ImageField(blank=True, upload_to='profile_images'),
+        ),
+    ]
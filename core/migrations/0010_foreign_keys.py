@@ -0,0 +1,129 @@
+import uuid
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def _delete_in_batches(queryset):
+    """Deletes the rows of queryset chunk by chunk, so they are never loaded at once"""
+    model = queryset.model
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        model.objects.filter(pk__in=ids).delete()
+
+
+def _delete_duplicates(model, *fields):
+    """Keeps the oldest row of every group of rows with equal fields"""
+    keep = model.objects.values(*fields).annotate(keep=Min('id')).values('keep')
+    _delete_in_batches(model.objects.exclude(id__in=keep))
+
+
+def normalize_like_post_ids(apps, schema_editor):
+    """
+    LikePost.post_id holds str(uuid) while the Post.id column holds uuid hex.
+    Rewrites every value to hex chunk by chunk, values which are no uuid at all are deleted
+    """
+    LikePost = apps.get_model('core', 'LikePost')
+
+    last_id = 0
+    while True:
+        chunk = list(LikePost.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'post_id')[:BATCH_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+
+        changed = []
+        invalid = []
+        for like_id, post_id in chunk:
+            try:
+                normalized = uuid.UUID(post_id).hex
+            except ValueError:
+                invalid.append(like_id)
+                continue
+            if normalized != post_id:
+                changed.append(LikePost(id=like_id, post_id=normalized))
+        LikePost.objects.bulk_update(changed, ['post_id'], batch_size=BATCH_SIZE)
+        LikePost.objects.filter(id__in=invalid).delete()
+
+
+def delete_dangling_rows(apps, schema_editor):
+    """
+    Rows pointing to deleted users or posts would violate the new foreign keys,
+    duplicate likes and follows the new unique constraints
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('core', 'Post')
+    LikePost = apps.get_model('core', 'LikePost')
+    FollowersCount = apps.get_model('core', 'FollowersCount')
+    usernames = User.objects.values('username')
+
+    _delete_in_batches(Post.objects.exclude(user__in=usernames))
+    _delete_in_batches(LikePost.objects.exclude(username__in=usernames))
+    _delete_in_batches(LikePost.objects.exclude(post_id__in=Post.objects.values('id')))
+    _delete_in_batches(FollowersCount.objects.exclude(follower__in=usernames))
+    _delete_in_batches(FollowersCount.objects.exclude(user__in=usernames))
+
+    _delete_duplicates(LikePost, 'post_id', 'username')
+    _delete_duplicates(FollowersCount, 'follower', 'user')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_like_post_ids, migrations.RunPython.noop),
+        migrations.RunPython(delete_dangling_rows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, to_field='username'),
+        ),
+        migrations.RenameField(
+            model_name='likepost',
+            old_name='post_id',
+            new_name='post',
+        ),
+        migrations.AlterField(
+            model_name='likepost',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='core.post'),
+        ),
+        migrations.RenameField(
+            model_name='likepost',
+            old_name='username',
+            new_name='user',
+        ),
+        migrations.AlterField(
+            model_name='likepost',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to=settings.AUTH_USER_MODEL, to_field='username'),
+        ),
+        migrations.AlterField(
+            model_name='followerscount',
+            name='follower',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL, to_field='username'),
+        ),
+        migrations.AlterField(
+            model_name='followerscount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL, to_field='username'),
+        ),
+        migrations.AddConstraint(
+            model_name='likepost',
+            constraint=models.UniqueConstraint(fields=('post', 'user'), name='unique_like'),
+        ),
+        migrations.AddConstraint(
+            model_name='followerscount',
+            constraint=models.UniqueConstraint(fields=('follower', 'user'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:13
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_post_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('references', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(storage=core.storage.media_storage, upload_to='post_images'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='profileimg',
+            field=models.ImageField(default='blank_profile.png', storage=core.storage.media_storage, upload_to='profile_images'),
+        ),
+    ]
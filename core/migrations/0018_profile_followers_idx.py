@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-18 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_post_user_score_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-followers_count', 'id'], name='profile_followers_idx'),
+        ),
+    ]
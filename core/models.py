@@ -1,8 +1,11 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 import uuid
 from datetime import datetime
 
+from .storage import media_storage
+
 User = get_user_model()
 
 
@@ -12,33 +15,162 @@ class Profile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     id_user = models.IntegerField()
     bio = models.TextField(blank=True)
-    profileimg = models.ImageField(upload_to='profile_images', default='blank_profile.png')
+    profileimg = models.ImageField(upload_to='profile_images', default='blank_profile.png', storage=media_storage)
+    profileimg_thumbnail = models.ImageField(upload_to='profile_images', blank=True)
+    # pixel widths of the original and its variants by variant name, recorded by core.images for srcset
+    profileimg_widths = models.JSONField(default=dict, blank=True)
     location = models.CharField(max_length=100, blank=True)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    posts_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # the most followed users are suggested in this order, see suggestions.compute_pool
+            models.Index(fields=['-followers_count', 'id'], name='profile_followers_idx'),
+        ]
 
     def __str__(self):
         return self.user.username
 
+class VisiblePostManager(models.Manager):
+    """Leaves out posts which have been deleted but not been cleaned up yet, see core.cleanup"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class Post(models.Model):
     id =  models.UUIDField(primary_key=True, default=uuid.uuid4)
-    user = models.CharField(max_length=100)
-    image = models.ImageField(upload_to='post_images')
+    # keyed by username, so the column keeps holding usernames as before.
+    # post_user_created_idx leads with it and serves lookups by author
+    user = models.ForeignKey(User, to_field='username', on_delete=models.CASCADE, related_name='posts', db_index=False)
+    image = models.ImageField(upload_to='post_images', storage=media_storage)
+    image_thumbnail = models.ImageField(upload_to='post_images', blank=True)
+    image_feed = models.ImageField(upload_to='post_images', blank=True)
+    # pixel widths of the original and its variants by variant name, recorded by core.images for srcset
+    image_widths = models.JSONField(default=dict, blank=True)
     caption = models.TextField()
     created_at = models.DateTimeField(default=datetime.now)
     no_of_likes = models.IntegerField(default=0)
+    # likes decayed by the age of the post, maintained by core.likes and core.ranking
+    score = models.FloatField(default=0)
+    # set by delete_post, the row is removed together with its likes and files by core.cleanup
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = VisiblePostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='post_user_created_idx'),
+            # only deleted posts waiting for their cleanup are indexed
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='post_deleted_idx'),
+            # walked in creation order by counters.reconcile_likes
+            models.Index(fields=['created_at', 'id'], name='post_created_idx'),
+            # the ranked feed reads the best posts of every followee in this order, see feed.ranked_posts
+            models.Index(fields=['user', '-score', '-created_at', '-id'], condition=models.Q(deleted_at__isnull=True), name='post_user_score_idx'),
+        ]
 
     def __str__(self):
-        return self.user
+        return self.user_id
 
 class LikePost(models.Model):
-    post_id = models.CharField(max_length=500)
-    username = models.CharField(max_length=100)
+    # leading column of unique_like, which serves lookups by post
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    user = models.ForeignKey(User, to_field='username', on_delete=models.CASCADE, related_name='likes')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], name='unique_like'),
+        ]
 
     def __str__(self):
-        return self.username
+        return self.user_id
 
 class FollowersCount(models.Model):
-    follower = models.CharField(max_length=100)
-    user = models.CharField(max_length=100)
+    # leading column of unique_follow, which serves lookups by follower
+    follower = models.ForeignKey(
+        User, to_field='username', on_delete=models.CASCADE, related_name='following', db_index=False,
+    )
+    user = models.ForeignKey(User, to_field='username', on_delete=models.CASCADE, related_name='followers')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'user'], name='unique_follow'),
+        ]
+
+    def __str__(self):
+        return self.user_id
+
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.CharField(max_length=100)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_created_idx'),
+            models.Index(fields=['owner', 'author'], name='timeline_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return self.owner.username
+
+
+class UsernameTrigram(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='username_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'user'], name='unique_username_trigram'),
+        ]
+
+    def __str__(self):
+        return self.trigram
+
+
+class Blob(models.Model):
+    """Reference count of a file in content addressed media storage, see core.storage"""
+    name = models.CharField(primary_key=True, max_length=255)
+    references = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
+    """Queued background job, see core.tasks"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # at most one queued task per key, enqueueing the same key again is a no-op until a worker claims it
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    # set when a worker claims the task, a running task whose lease ran out is claimed again
+    claim = models.CharField(max_length=32, null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='queued'), name='unique_queued_task_key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+            models.Index(fields=['claim'], name='task_claim_idx'),
+        ]
 
     def __str__(self):
-        return self.user
\ No newline at end of file
+        return self.name
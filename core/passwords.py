@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# Password hashes computed at once. PBKDF2, argon2 and bcrypt release the GIL while hashing,
+# so threads use all cores without request threads piling up on them
+PASSWORD_HASHING_WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS', os.cpu_count() or 2)
+# Hashes running or waiting for a worker, requests past it wait PASSWORD_HASHING_WAIT seconds for a slot
+PASSWORD_HASHING_BACKLOG = getattr(settings, 'PASSWORD_HASHING_BACKLOG', 4 * PASSWORD_HASHING_WORKERS)
+PASSWORD_HASHING_WAIT = getattr(settings, 'PASSWORD_HASHING_WAIT', 1.0)
+# Seconds clients are asked to wait before retrying a rejected sign in or sign up
+PASSWORD_HASHING_RETRY_AFTER = getattr(settings, 'PASSWORD_HASHING_RETRY_AFTER', 5)
+
+_slots = threading.BoundedSemaphore(PASSWORD_HASHING_BACKLOG)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing backlog stays full, callers answer with 503 instead of queueing more work"""
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASHING_WORKERS, thread_name_prefix='password-hashing')
+    return _executor
+
+
+def run(function, *args):
+    """
+    Runs a hashing function in the bounded pool and waits for its result
+
+    :raises HashingOverloaded: if no backlog slot frees up within PASSWORD_HASHING_WAIT seconds
+    """
+    if not _slots.acquire(timeout=PASSWORD_HASHING_WAIT):
+        raise HashingOverloaded(f'{PASSWORD_HASHING_BACKLOG} password hashes are pending')
+    try:
+        return _get_executor().submit(function, *args).result()
+    finally:
+        _slots.release()
+
+
+def make(password):
+    """
+    :param password: raw password
+    :type password: string
+    :returns: password hashed with the preferred hasher, for User.password
+    :rtype: string
+    """
+    return run(hashers.make_password, password)
+
+
+def _verify(password, encoded):
+    valid = hashers.check_password(password, encoded)
+    if not valid:
+        return False, False
+    hasher = hashers.identify_hasher(encoded)
+    preferred = hashers.get_hasher('default')
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def check(user, password):
+    """
+    Verifies password of user like User.check_password does, the hash is computed in the pool.
+    Hashes of outdated hashers or iteration counts are upgraded
+
+    :param user: user with a stored password hash
+    :param password: raw password
+    :type user: UserModel
+    :type password: string
+    :returns: whether password is correct
+    :rtype: boolean
+    """
+    if not user.has_usable_password():
+        return False
+    valid, must_update = run(_verify, password, user.password)
+    if must_update:
+        user.password = make(password)
+        user.save(update_fields=['password'])
+    return valid
+
+
+def measure(hasher, duration=1.0, threads=1):
+    """
+    Encodes a password with hasher from threads in parallel for about duration seconds
+
+    :param hasher: hasher to measure
+    :param duration: seconds to hash for
+    :param threads: amount of hashing threads
+    :type hasher: BasePasswordHasher
+    :type duration: number
+    :type threads: number
+    :returns: hashes per second over all threads
+    :rtype: number
+    """
+    counts = [0] * threads
+    deadline = time.perf_counter() + duration
+
+    def hash_until_deadline(index):
+        salt = hasher.salt()
+        while time.perf_counter() < deadline:
+            hasher.encode('benchmark password', salt)
+            counts[index] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=hash_until_deadline, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started)
@@ -0,0 +1,128 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Post, Task
+from . import counters, tasks
+
+# Seconds after which a like on a post counts half as much in its score
+FEED_SCORE_HALF_LIFE = getattr(settings, 'FEED_SCORE_HALF_LIFE', 24 * 60 * 60)
+# Seconds between rescales of all scores, likes in between are weighted as of the start of the interval
+FEED_SCORE_DECAY_INTERVAL = getattr(settings, 'FEED_SCORE_DECAY_INTERVAL', 60 * 60)
+# Posts per chunk of a re-decay, every chunk is written in its own transaction
+FEED_SCORE_BATCH_SIZE = getattr(settings, 'FEED_SCORE_BATCH_SIZE', 1000)
+
+# Post.score holds the likes of a post times weight(created_at, decay_time()), every score shares
+# the same reference time, so ordering by the column ranks posts as if all were decayed to now.
+# A periodic task moves all scores to the reference time of every new interval, see redecay_task
+
+
+def decay_time(now=None):
+    """
+    :returns: start of the current decay interval, the reference time of every score.
+            Derived from the clock alone, so all processes weight likes alike without sharing state
+    :rtype: datetime
+    """
+    now = now or timezone.now()
+    seconds = now.timestamp() // FEED_SCORE_DECAY_INTERVAL * FEED_SCORE_DECAY_INTERVAL
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def weight(created_at, at):
+    """
+    :param created_at: creation time of the post
+    :param at: reference time
+    :type created_at: datetime
+    :type at: datetime
+    :returns: what one like of a post created at created_at is worth at time at
+    :rtype: number
+    """
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at, dt_timezone.utc)
+    return 0.5 ** ((at - created_at).total_seconds() / FEED_SCORE_HALF_LIFE)
+
+
+def rescale(since, at):
+    """
+    Moves every score from reference time since to at with one UPDATE, all scores decay by the same
+    factor, so no likes are counted and likes still buffered by web processes are not counted twice
+
+    :param since: reference time the scores are stored for
+    :param at: new reference time
+    :type since: datetime
+    :type at: datetime
+    :returns: amount of updated posts
+    :rtype: number
+    """
+    factor = 0.5 ** ((at - since).total_seconds() / FEED_SCORE_HALF_LIFE)
+    if factor == 1:
+        return 0
+    return Post.objects.exclude(score=0).update(score=F('score') * factor)
+
+
+def redecay(batch_size=FEED_SCORE_BATCH_SIZE, pause=0):
+    """
+    Recomputes the score of every post from its likes as of the current decay interval.
+    Posts are walked by (created_at, id), every chunk counts its likes with one grouped query and
+    writes the changed scores with bulk_update in its own short transaction.
+    Drift of the incremental updates, e.g. by unlikes weighted in a later interval than their like, is corrected as well.
+    Likes still buffered by web processes are counted as well and added again by their flush,
+    so it is run by hand, the periodic task only rescales, see redecay_task
+
+    :param batch_size: amount of posts per chunk
+    :type batch_size: number
+    :param pause: seconds to sleep between chunks
+    :type pause: number
+    :returns: amount of checked and updated posts
+    :rtype: (number, number)
+    """
+    at = decay_time()
+    posts = Post.objects.order_by('created_at', 'id').only('id', 'created_at', 'score')
+    checked = 0
+    updated = 0
+    last = None
+    while True:
+        chunk_posts = posts
+        if last is not None:
+            chunk_posts = posts.filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id))
+
+        with transaction.atomic():
+            chunk = list(chunk_posts[:batch_size])
+            if not chunk:
+                break
+            last = chunk[-1]
+
+            likes = counters.true_like_counts([post.id for post in chunk])
+            changed = []
+            for post in chunk:
+                score = likes[post.id] * weight(post.created_at, at)
+                if abs(post.score - score) > 1e-9:
+                    post.score = score
+                    changed.append(post)
+            if changed:
+                Post.objects.bulk_update(changed, ['score'])
+
+        checked += len(chunk)
+        updated += len(changed)
+        time.sleep(pause)
+    # the periodic rescale continues from the recomputed scores
+    Task.objects.filter(name='ranking.redecay', status=Task.QUEUED).update(payload={'at': at.timestamp()})
+    return checked, updated
+
+
+@tasks.handler('ranking.redecay', every=FEED_SCORE_DECAY_INTERVAL)
+def redecay_task(payloads):
+    """
+    Rescales all scores to the current decay interval. Every run hands the reference time of the scores
+    to the next one, so a delayed run decays by all intervals it missed.
+    The first run only records the reference time, scores of an unknown one are fixed by the decay_scores command
+    """
+    at = decay_time()
+    since = payloads[-1].get('at')
+    if since is not None:
+        rescale(datetime.fromtimestamp(since, tz=dt_timezone.utc), at)
+    return {'at': at.timestamp()}
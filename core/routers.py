@@ -0,0 +1,54 @@
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Alias of the read replica, reads are only routed there if it is configured in DATABASES
+REPLICA_DATABASE = getattr(settings, 'REPLICA_DATABASE', 'replica')
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+def reads_from_replica():
+    """:returns: whether reads of the current request are routed to the replica"""
+    return _replica_reads.get() and replica_configured()
+
+
+def use_replica(enabled):
+    """
+    Routes reads of the current request to the replica or back to the default database
+
+    :returns: token for _replica_reads.reset
+    """
+    return _replica_reads.set(enabled)
+
+
+def reset_replica(token):
+    _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of read only views to the replica, see ReplicaRoutingMiddleware.
+    Every write goes to the default database, even for instances read from the replica
+    """
+
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica is a copy of the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica receives the migrated schema with its next sync, see sync_replica
+        return db != REPLICA_DATABASE
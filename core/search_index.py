@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+from .models import Profile, UsernameTrigram
+
+# How many profiles one page of search results holds
+SEARCH_PAGE_SIZE = getattr(settings, 'SEARCH_PAGE_SIZE', 20)
+SEARCH_BATCH_SIZE = getattr(settings, 'SEARCH_BATCH_SIZE', 1000)
+# Candidates read per index lookup of one or two character queries, only they are ranked
+SEARCH_SHORT_QUERY_LIMIT = getattr(settings, 'SEARCH_SHORT_QUERY_LIMIT', 500)
+
+# sorts after every character a trigram can start with
+_MAX_CHAR = '\U0010ffff'
+
+
+def trigrams(username):
+    """
+    Splits a username into lowercase trigrams. The name is padded with two spaces on both sides,
+    so every one or two character substring is the beginning of some trigram and prefixes
+    produce trigrams starting with spaces
+
+    :param username: username to split
+    :type username: string
+    :returns: unique trigrams of the username
+    :rtype: set of strings
+    """
+    padded = f'  {username.lower()}  '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def index_user(user):
+    """
+    Writes search index rows of a user, replacing previous ones
+
+    :param user: user to index
+    :type user: UserModel
+    """
+    with transaction.atomic():
+        UsernameTrigram.objects.filter(user=user).delete()
+        UsernameTrigram.objects.bulk_create(
+            [UsernameTrigram(user=user, trigram=trigram) for trigram in trigrams(user.username)]
+        )
+
+
+def _candidates(query):
+    """:returns: condition on profiles matching the users which may contain query"""
+    if len(query) < 3:
+        # short queries match a large share of all users, so both index reads stop after
+        # SEARCH_SHORT_QUERY_LIMIT rows: usernames beginning with query, found by their padded first trigram,
+        # and a range scan over trigrams beginning with query for the other substring matches
+        prefixes = UsernameTrigram.objects.filter(trigram=f'{query:>3}').order_by('trigram', 'user').values('user')
+        substrings = (
+            UsernameTrigram.objects.filter(trigram__gte=query, trigram__lt=query + _MAX_CHAR)
+            .order_by('trigram', 'user')
+            .values('user')
+        )
+        return Q(user__in=prefixes[:SEARCH_SHORT_QUERY_LIMIT]) | Q(user__in=substrings[:SEARCH_SHORT_QUERY_LIMIT])
+
+    grams = {query[i:i + 3] for i in range(len(query) - 2)}
+    users = (
+        UsernameTrigram.objects.filter(trigram__in=grams)
+        .values('user')
+        .annotate(matched=Count('trigram'))
+        .filter(matched=len(grams))
+        .values('user')
+    )
+    return Q(user__in=users)
+
+
+def search_profiles(query, page=1, limit=SEARCH_PAGE_SIZE):
+    """
+    Finds profiles whose username contains query. Exact matches come first, then prefix matches,
+    then other substring matches, shorter usernames first within each group
+
+    :param query: searched part of a username
+    :param page: number of the result page, starting with 1
+    :param limit: amount of profiles per page
+    :type query: string
+    :type page: number
+    :type limit: number
+    :returns: profiles of the page and whether a next page exists
+    :rtype: (ProfileModel[], boolean)
+    """
+    query = query.strip().lower()
+    if not query:
+        return [], False
+
+    offset = (max(page, 1) - 1) * limit
+    profiles = (
+        Profile.objects.filter(_candidates(query), user__username__icontains=query)
+        .select_related('user')
+        .annotate(rank=Case(
+            When(user__username__iexact=query, then=Value(0)),
+            When(user__username__istartswith=query, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ))
+        .order_by('rank', Length('user__username'), 'user__username')[offset:offset + limit + 1]
+    )
+    profiles = list(profiles)
+    return profiles[:limit], len(profiles) > limit
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from .routers import REPLICA_DATABASE
+
+# Applied to every new SQLite connection. WAL lets readers run next to one writer,
+# synchronous=NORMAL only syncs at checkpoints, which is safe in WAL mode,
+# busy_timeout makes a writer wait for the lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = getattr(settings, 'SQLITE_PRAGMAS', {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+})
+
+
+def configure_connection(connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+
+    # on the raw sqlite3 connection, so request metrics do not count them as queries of the view
+    for pragma, value in SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
+    if connection.alias == REPLICA_DATABASE:
+        # reads only, a write reaching the replica is a routing bug
+        connection.connection.execute('PRAGMA query_only = ON')
+
+
+def install_pragmas():
+    connection_created.connect(configure_connection, dispatch_uid='core.sqlite.pragmas')
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Hex digits of the sha256 digest used in blob names, 160 bits keep names short enough for
+# the 100 characters of ImageField together with the shard directories and variant suffixes
+BLOB_DIGEST_LENGTH = getattr(settings, 'BLOB_DIGEST_LENGTH', 40)
+
+# blobs and the variants core.images generates next to them in a 'variants' directory
+_BLOB_NAME = re.compile(r'^.+/[0-9a-f]{2}/[0-9a-f]{2}/(variants/)?[0-9a-f]+(_\w+)?(\.\w+)?$')
+
+
+def blob_name(directory, digest, extension):
+    """
+    :param directory: upload_to directory of the field
+    :param digest: hex sha256 digest of the content
+    :param extension: extension of the uploaded file including the dot, may be empty
+    :type directory: string
+    :type digest: string
+    :type extension: string
+    :returns: name of the blob sharded by the first two bytes of digest,
+            e.g. post_images/3f/a1/3fa1....png
+    :rtype: string
+    """
+    digest = digest[:BLOB_DIGEST_LENGTH]
+    return f'{directory}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_blob_name(name):
+    return bool(name) and _BLOB_NAME.match(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage which names files after the sha256 of their content.
+    The content is hashed while it is streamed to a temporary file, which is then renamed to its blob name.
+    A file equal to one stored before is not written a second time, its blob name is returned instead.
+    Blobs are shared between posts and profiles, core.blobs counts their references
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # names are derived from content, an existing file already holds the same bytes
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1]
+        os.makedirs(self.path(directory), exist_ok=True)
+
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=self.path(directory), prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+
+            name = blob_name(directory, digest.hexdigest(), extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+                # a blob released meanwhile counts as fresh again, so the orphan sweep keeps it through its grace period
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                # atomic, a concurrent upload of the same content renames identical bytes onto it
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+
+_media_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    """Storage of uploaded post and profile images"""
+    return _media_storage
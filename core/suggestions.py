@@ -0,0 +1,113 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Profile, FollowersCount
+from .loaders import ProfileLoader
+
+# How many suggestions index shows
+SUGGESTIONS_COUNT = getattr(settings, 'SUGGESTIONS_COUNT', 4)
+# How many ranked candidates are precomputed per user, shown suggestions are sampled from them
+SUGGESTIONS_POOL_SIZE = getattr(settings, 'SUGGESTIONS_POOL_SIZE', 20)
+# Seconds a precomputed pool is kept before it is recomputed
+SUGGESTIONS_TIMEOUT = getattr(settings, 'SUGGESTIONS_TIMEOUT', 15 * 60)
+
+
+def _cache_key(username):
+    return f'suggestions:{username}'
+
+
+def compute_pool(username, size=SUGGESTIONS_POOL_SIZE):
+    """
+    Ranks users username could follow: friends of friends first, ordered by amount of mutual follows,
+    then the most followed users by their denormalized followers_count, then the newest users. Costs at most three queries
+
+    :param username: username of the viewer
+    :param size: maximal amount of candidates
+    :type username: string
+    :type size: number
+    :returns: usernames of candidates, best first
+    :rtype: string[]
+    """
+    following = FollowersCount.objects.filter(follower=username).values('user')
+
+    friends_of_friends = (
+        FollowersCount.objects.filter(follower__in=following)
+        .exclude(user__in=following)
+        .exclude(user=username)
+        .values('user')
+        .annotate(mutual=Count('id'))
+        .order_by('-mutual', 'user')
+        .values_list('user', flat=True)[:size]
+    )
+    pool = list(friends_of_friends)
+
+    if len(pool) < size:
+        # walks profile_followers_idx down from the most followed profile instead of grouping the follow graph
+        popular = (
+            Profile.objects.filter(followers_count__gt=0)
+            .exclude(user__username__in=following)
+            .exclude(user__username=username)
+            .exclude(user__username__in=pool)
+            .order_by('-followers_count', 'id')
+            .values_list('user__username', flat=True)[:size - len(pool)]
+        )
+        pool.extend(popular)
+
+    if len(pool) < size:
+        newest = (
+            User.objects.filter(profile__isnull=False)
+            .exclude(username__in=following)
+            .exclude(username=username)
+            .exclude(username__in=pool)
+            .order_by('-id')
+            .values_list('username', flat=True)[:size - len(pool)]
+        )
+        pool.extend(newest)
+
+    return pool
+
+
+def refresh(username):
+    """
+    Drops the precomputed pool of username, it is recomputed on the next index visit
+
+    :param username: username whose follow graph has changed
+    :type username: string
+    """
+    cache.delete(_cache_key(username))
+
+
+def suggestions_for(username, count=SUGGESTIONS_COUNT, loader=None):
+    """
+    Samples suggestions out of the precomputed pool of username and loads their profiles in one query,
+    together with other profiles queued on loader
+
+    :param username: username of the viewer
+    :param count: amount of suggestions
+    :param loader: profile loader of the request
+    :type username: string
+    :type count: number
+    :type loader: ProfileLoader or None
+    :returns: profiles of suggested users
+    :rtype: ProfileModel[]
+    """
+    key = _cache_key(username)
+    pool = cache.get(key)
+    cached = pool is not None
+    if not cached:
+        pool = compute_pool(username)
+        cache.set(key, pool, SUGGESTIONS_TIMEOUT)
+
+    chosen = random.sample(pool, min(count, len(pool)))
+    profiles = (loader or ProfileLoader()).get_many(usernames=chosen)
+
+    # a cached pool may point to users deleted since, recompute it once
+    if cached and len(profiles) < len(chosen):
+        refresh(username)
+        return suggestions_for(username, count, loader)
+
+    return profiles
@@ -0,0 +1,284 @@
+import importlib
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction, IntegrityError, DatabaseError
+from django.db.models import Count, Min, F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+metrics_logger = logging.getLogger('core.metrics')
+
+# Modules whose handlers are registered before a worker starts
+TASK_MODULES = getattr(settings, 'TASK_MODULES', (
+    'core.images', 'core.cleanup', 'core.timeline', 'core.counters', 'core.ranking',
+))
+# Attempts of a task before it is kept as failed
+TASKS_MAX_ATTEMPTS = getattr(settings, 'TASKS_MAX_ATTEMPTS', 5)
+# Seconds before the first retry, doubled with every further attempt up to TASKS_RETRY_MAX_DELAY
+TASKS_RETRY_DELAY = getattr(settings, 'TASKS_RETRY_DELAY', 5)
+TASKS_RETRY_MAX_DELAY = getattr(settings, 'TASKS_RETRY_MAX_DELAY', 60 * 60)
+# Seconds a claimed batch may run before another worker claims it again
+TASKS_LEASE = getattr(settings, 'TASKS_LEASE', 5 * 60)
+# Seconds an idle worker thread sleeps before looking for due tasks again
+TASKS_POLL_INTERVAL = getattr(settings, 'TASKS_POLL_INTERVAL', 1.0)
+# Seconds between queue depth reports of a running worker
+TASKS_METRICS_INTERVAL = getattr(settings, 'TASKS_METRICS_INTERVAL', 60)
+
+
+class Handler:
+    def __init__(self, function, batch_size, max_attempts, every):
+        self.function = function
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.every = every
+
+
+_handlers = {}
+
+
+def handler(name, batch_size=1, max_attempts=TASKS_MAX_ATTEMPTS, every=None):
+    """
+    Registers a function as handler of tasks called name. It is called with the payloads of up to
+    batch_size due tasks of that name at once and has to be idempotent, a batch which raises is run again
+    one payload at a time, so only the tasks which fail on their own are retried.
+    Handlers with every are periodic: workers enqueue them on start and every run enqueues the next one
+    at the next multiple of every seconds, with the payload the handler returns
+
+    :param name: name tasks are enqueued with
+    :type name: string
+    :param batch_size: maximal amount of payloads per call
+    :type batch_size: number
+    :param max_attempts: attempts of a task before it is kept as failed
+    :type max_attempts: number
+    :param every: seconds between runs of a periodic task, which is enqueued with the key name,
+            its first run gets an empty payload
+    :type every: number or None
+    """
+    def register(function):
+        _handlers[name] = Handler(function, batch_size, max_attempts, every)
+        return function
+    return register
+
+
+def autodiscover():
+    """Imports TASK_MODULES, which register their handlers"""
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue(name, payload, key=None, delay=0):
+    """
+    Stores a task in the current transaction, it is run by a worker once the transaction has committed.
+    While a task with the same key is queued, enqueueing it again does nothing
+
+    :param name: name of a registered handler
+    :type name: string
+    :param payload: JSON serializable arguments of the handler
+    :type payload: dictionary
+    :param key: idempotency key
+    :type key: string or None
+    :param delay: seconds to wait before the task is due
+    :type delay: number
+    """
+    Task.objects.bulk_create(
+        [Task(name=name, payload=payload, key=key, run_at=timezone.now() + timedelta(seconds=delay))],
+        ignore_conflicts=True,
+    )
+
+
+def _due(now):
+    return Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+
+
+def _fail_abandoned(now):
+    abandoned = Task.objects.filter(status=Task.RUNNING, locked_until__lt=now).values_list('id', 'name', 'attempts')
+    for task_id, name, attempts in abandoned:
+        max_attempts = _handlers[name].max_attempts if name in _handlers else TASKS_MAX_ATTEMPTS
+        if attempts >= max_attempts:
+            Task.objects.filter(id=task_id, status=Task.RUNNING, locked_until__lt=now).update(
+                status=Task.FAILED, last_error='The worker stopped during every attempt',
+            )
+            logger.error('Task %s %s failed for good after %d abandoned attempts', name, task_id, attempts)
+
+
+def claim():
+    """
+    Claims a batch of due tasks of one name, the oldest due task decides the name.
+    Running tasks whose lease has run out are due again, unless they have used up their attempts,
+    e.g. because their worker crashed on every one of them, those are kept as failed
+
+    :returns: claimed tasks, empty if nothing is due
+    :rtype: TaskModel[]
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        _fail_abandoned(now)
+        oldest = Task.objects.filter(_due(now)).order_by('run_at', 'id').values_list('name', flat=True).first()
+        if oldest is None:
+            return []
+        batch_size = _handlers[oldest].batch_size if oldest in _handlers else 1
+        ids = Task.objects.filter(_due(now), name=oldest).order_by('run_at', 'id').values_list('id', flat=True)[:batch_size]
+
+        token = uuid.uuid4().hex
+        # the due condition is checked again, a concurrent worker may have claimed some of them
+        Task.objects.filter(_due(now), id__in=list(ids)).update(
+            status=Task.RUNNING, claim=token, locked_until=now + timedelta(seconds=TASKS_LEASE), attempts=F('attempts') + 1,
+        )
+        return list(Task.objects.filter(claim=token).order_by('id'))
+
+
+def _retry_delay(attempts):
+    return min(TASKS_RETRY_DELAY * 2 ** (attempts - 1), TASKS_RETRY_MAX_DELAY)
+
+
+def _failed(tasks, error, max_attempts):
+    for task in tasks:
+        if task.attempts >= max_attempts:
+            Task.objects.filter(id=task.id, claim=task.claim).update(status=Task.FAILED, last_error=error)
+            logger.error('Task %s %s failed for good after %d attempts: %s', task.name, task.id, task.attempts, error)
+            continue
+        try:
+            with transaction.atomic():
+                Task.objects.filter(id=task.id, claim=task.claim).update(
+                    status=Task.QUEUED, claim=None, locked_until=None, last_error=error,
+                    run_at=timezone.now() + timedelta(seconds=_retry_delay(task.attempts)),
+                )
+        except IntegrityError:
+            # the same key has been enqueued again meanwhile, that task does the work
+            Task.objects.filter(id=task.id, claim=task.claim).delete()
+
+
+def _run_alone(registered, task):
+    try:
+        registered.function([task.payload])
+    except Exception as error:
+        logger.exception('Task %s %s failed and is retried', task.name, task.id)
+        _failed([task], f'{type(error).__name__}: {error}', registered.max_attempts)
+    else:
+        Task.objects.filter(id=task.id, claim=task.claim).delete()
+
+
+def run_batch():
+    """
+    Claims and runs one batch of due tasks. Finished tasks are deleted,
+    failed ones are retried with exponential backoff until they run out of attempts.
+    If the batch raises, its tasks are run one at a time and only the failing ones are retried
+
+    :returns: amount of claimed tasks
+    :rtype: number
+    """
+    tasks = claim()
+    if not tasks:
+        return 0
+
+    name = tasks[0].name
+    registered = _handlers.get(name)
+    if registered is None:
+        _failed(tasks, f'No handler is registered for {name}', max_attempts=0)
+        return len(tasks)
+
+    result = None
+    try:
+        result = registered.function([task.payload for task in tasks])
+    except Exception as error:
+        if len(tasks) == 1:
+            logger.exception('Task %s failed and is retried', name)
+            _failed(tasks, f'{type(error).__name__}: {error}', registered.max_attempts)
+        else:
+            # one bad payload must not hold back the others, each task runs alone to find the failing ones
+            logger.warning('Batch of %d %s tasks failed, they are run one at a time', len(tasks), name, exc_info=True)
+            for task in tasks:
+                _run_alone(registered, task)
+    else:
+        Task.objects.filter(claim=tasks[0].claim).delete()
+    if registered.every is not None:
+        # aligned to the clock, so e.g. a re-decay of core.ranking runs right after its interval starts
+        delay = registered.every - timezone.now().timestamp() % registered.every
+        enqueue(name, result or {}, key=name, delay=delay)
+    return len(tasks)
+
+
+def schedule_periodic():
+    """Enqueues every periodic task which is not queued yet, so it runs now"""
+    for name, registered in _handlers.items():
+        if registered.every is not None:
+            enqueue(name, {}, key=name)
+
+
+def run_pending():
+    """
+    Runs due tasks in the current thread until none is left
+
+    :returns: amount of run tasks
+    :rtype: number
+    """
+    autodiscover()
+    total = 0
+    while True:
+        ran = run_batch()
+        if not ran:
+            return total
+        total += ran
+
+
+def depth():
+    """
+    :returns: amount of tasks per name and status and seconds the oldest queued task of every name has been due
+    :rtype: { [name]: { queued: number, running: number, failed: number, lag: number } }
+    """
+    now = timezone.now()
+    result = {}
+    for name, status, count in Task.objects.order_by().values_list('name', 'status').annotate(n=Count('id')):
+        result.setdefault(name, {Task.QUEUED: 0, Task.RUNNING: 0, Task.FAILED: 0, 'lag': 0})[status] = count
+    oldest = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by().values('name').annotate(due=Min('run_at'))
+    for row in oldest:
+        result[row['name']]['lag'] = round((now - row['due']).total_seconds(), 3)
+    return result
+
+
+def _work(stop, poll_interval):
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            ran = run_batch()
+        except DatabaseError:
+            # e.g. the database is locked by a long write, the batch is claimed on the next round
+            logger.exception('Claiming tasks failed')
+            ran = 0
+        if not ran:
+            stop.wait(poll_interval)
+    close_old_connections()
+
+
+def work(threads=1, poll_interval=TASKS_POLL_INTERVAL, metrics_interval=TASKS_METRICS_INTERVAL, stop=None):
+    """
+    Runs due tasks in a pool of threads until stop is set, logging queue depths every metrics_interval seconds
+
+    :param threads: amount of worker threads
+    :type threads: number
+    :param stop: set to let the threads finish their current batch and return
+    :type stop: threading.Event or None
+    """
+    autodiscover()
+    schedule_periodic()
+    stop = stop or threading.Event()
+    workers = [
+        threading.Thread(target=_work, args=(stop, poll_interval), name=f'tasks-{index}', daemon=True)
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while not stop.wait(metrics_interval):
+            metrics_logger.info('Task queue depth %s', depth())
+            close_old_connections()
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,29 @@
+import os
+
+from django.apps import apps
+from django.template import engines
+
+
+def core_template_names():
+    """:returns: names of all templates in the template directory of the core app"""
+    directory = os.path.join(apps.get_app_config('core').path, 'templates')
+    return sorted(
+        os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+        for root, _, filenames in os.walk(directory)
+        for filename in filenames
+        if filename.endswith('.html')
+    )
+
+
+def warm():
+    """
+    Compiles every core template into the cached template loader
+
+    :returns: amount of compiled templates
+    :rtype: number
+    """
+    names = core_template_names()
+    engine = engines['django']
+    for name in names:
+        engine.get_template(name)
+    return len(names)
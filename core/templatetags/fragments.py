@@ -0,0 +1,33 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import fragments
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        return mark_safe(fragments.get_or_render(key, lambda: self.nodelist.render(context)))
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    Caches the enclosed part of a template under a versioned key built by core.fragments, e.g.
+    {% fragment post_grid_key %}...{% endfragment %}.
+    Without a key the part is rendered every time. Never wrap a csrf_token
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag takes one argument, the fragment key")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]))
@@ -0,0 +1,23 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(original, widths, **variants):
+    """
+    Builds a srcset attribute value out of generated image variants and the original image, e.g.
+    {% srcset post.image post.image_widths thumbnail=post.image_thumbnail feed=post.image_feed %}.
+    Candidates are described by the widths recorded when the variants were generated, images
+    without a recorded width are left out. The original comes last as the largest candidate
+    """
+    widths = widths or {}
+    candidates = []
+    seen = set()
+    for variant, image in [*variants.items(), ('original', original)]:
+        width = widths.get(variant)
+        # variants are never upscaled, a small original can be as wide as its variants
+        if image and width and width not in seen:
+            candidates.append(f'{image.url} {width}w')
+            seen.add(width)
+    return ', '.join(candidates)
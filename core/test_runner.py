@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    Test runner which turns exceeded query budgets of views into test errors.
+    Buffered likes are flushed by the tests themselves, a flusher thread would write outside the test transaction
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        settings.LIKES_FLUSH_THREAD = False
@@ -0,0 +1,196 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Post, FollowersCount, TimelineEntry
+from . import tasks
+
+# How many entries index reads from a timeline on one page load
+TIMELINE_PAGE_SIZE = getattr(settings, 'TIMELINE_PAGE_SIZE', 50)
+# Upper bound of entries kept per timeline, older entries are trimmed away
+TIMELINE_MAX_LENGTH = getattr(settings, 'TIMELINE_MAX_LENGTH', 800)
+# Size of bulk_create batches used by fan out, backfill and rebuild
+TIMELINE_BATCH_SIZE = getattr(settings, 'TIMELINE_BATCH_SIZE', 500)
+
+
+def _entries_for_post(post, owner_ids):
+    return [
+        TimelineEntry(owner_id=owner_id, post=post, author=post.user_id, created_at=post.created_at)
+        for owner_id in owner_ids
+    ]
+
+
+def fan_out(post):
+    """
+    Pushes a freshly uploaded post into the timeline of every follower of its author
+
+    :param post: post that has just been created
+    :type post: PostModel
+    :returns: amount of timelines the post has been written to
+    :rtype: number
+    """
+    follower_usernames = FollowersCount.objects.filter(user=post.user_id).values('follower')
+    owner_ids = User.objects.filter(username__in=follower_usernames).values_list('id', flat=True)
+
+    written = 0
+    batch = []
+    for owner_id in owner_ids.iterator(chunk_size=TIMELINE_BATCH_SIZE):
+        batch.append(owner_id)
+        if len(batch) >= TIMELINE_BATCH_SIZE:
+            written += _push(post, batch)
+            batch = []
+    if batch:
+        written += _push(post, batch)
+    return written
+
+
+def _push(post, owner_ids):
+    TimelineEntry.objects.bulk_create(_entries_for_post(post, owner_ids), ignore_conflicts=True)
+    # only timelines which grew past their bound are trimmed, one grouped count finds them
+    overfull = (
+        TimelineEntry.objects.filter(owner_id__in=owner_ids)
+        .order_by()
+        .values('owner_id')
+        .annotate(n=Count('id'))
+        .filter(n__gt=TIMELINE_MAX_LENGTH)
+        .values_list('owner_id', flat=True)
+    )
+    for owner_id in overfull:
+        trim(owner_id)
+    return len(owner_ids)
+
+
+def backfill(follower, user):
+    """
+    Copies the most recent posts of a newly followed user into the follower's timeline
+
+    :param follower: username of the user who started following
+    :param user: username of the followed user
+    :type follower: string
+    :type user: string
+    """
+    owner = User.objects.filter(username=follower).first()
+    if owner is None:
+        return
+
+    posts = Post.objects.filter(user=user).order_by('-created_at')[:TIMELINE_MAX_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner=owner, post=post, author=post.user_id, created_at=post.created_at)
+            for post in posts
+        ],
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(owner)
+
+
+def retract(follower, user):
+    """
+    Removes posts of an unfollowed user from the follower's timeline
+
+    :param follower: username of the user who stopped following
+    :param user: username of the unfollowed user
+    :type follower: string
+    :type user: string
+    """
+    TimelineEntry.objects.filter(owner__username=follower, author=user).delete()
+
+
+def sync_follow(follower, user):
+    """
+    Queues a backfill or retraction of the follower's timeline, whichever matches the follow graph
+    once the task runs, so following and unfollowing again in quick succession is handled by one task
+
+    :param follower: username of the user who started or stopped following
+    :param user: username of the followed or unfollowed user
+    :type follower: string
+    :type user: string
+    """
+    # two usernames of up to 150 characters do not fit Task.key
+    pair = hashlib.sha256(f'{follower}:{user}'.encode()).hexdigest()
+    tasks.enqueue('timeline.sync_follow', {'follower': follower, 'user': user}, key=f'follow:{pair}')
+
+
+@tasks.handler('timeline.sync_follow', batch_size=TIMELINE_BATCH_SIZE)
+def sync_follows(payloads):
+    pairs = {(payload['follower'], payload['user']) for payload in payloads}
+    following = set(
+        FollowersCount.objects.filter(follower__in={follower for follower, _ in pairs}, user__in={user for _, user in pairs})
+        .values_list('follower', 'user')
+    )
+    for follower, user in pairs:
+        if (follower, user) in following:
+            backfill(follower, user)
+        else:
+            retract(follower, user)
+
+
+def trim(owner):
+    """
+    Drops everything older than the newest TIMELINE_MAX_LENGTH entries of a timeline
+
+    :param owner: owner of the timeline or their id
+    :type owner: UserModel or number
+    """
+    boundary = (
+        TimelineEntry.objects.filter(owner=owner)
+        .order_by('-created_at')
+        .values_list('created_at', flat=True)[TIMELINE_MAX_LENGTH:TIMELINE_MAX_LENGTH + 1]
+    )
+    boundary = list(boundary)
+    if boundary:
+        TimelineEntry.objects.filter(owner=owner, created_at__lte=boundary[0]).delete()
+
+
+def read(owner, before=None, limit=TIMELINE_PAGE_SIZE):
+    """
+    Returns a page of a timeline with a single query, newest posts first
+
+    :param owner: owner of the timeline
+    :param before: post the previous page ended with, only older posts are returned
+    :param limit: maximal amount of posts to return
+    :type owner: UserModel
+    :type before: PostModel or None
+    :type limit: number
+    :returns: posts ordered from newest to oldest
+    :rtype: PostModel[]
+    """
+    # entries of deleted posts stay until the cleanup of the post removes them
+    entries = TimelineEntry.objects.filter(owner=owner, post__deleted_at__isnull=True)
+    if before is not None:
+        entries = entries.filter(
+            Q(created_at__lt=before.created_at)
+            | Q(created_at=before.created_at, post_id__lt=before.id)
+        )
+    entries = entries.select_related('post').order_by('-created_at', '-post_id')[:limit]
+    return [entry.post for entry in entries]
+
+
+def rebuild(owner):
+    """
+    Rebuilds a timeline from scratch out of the follow graph and posts tables
+
+    :param owner: owner of the timeline
+    :type owner: UserModel
+    :returns: amount of entries written
+    :rtype: number
+    """
+    followees = FollowersCount.objects.filter(follower=owner.username).values('user')
+    posts = (
+        Post.objects.filter(user__in=followees)
+        .order_by('-created_at')
+        .only('id', 'user', 'created_at')[:TIMELINE_MAX_LENGTH]
+    )
+    entries = [
+        TimelineEntry(owner=owner, post=post, author=post.user_id, created_at=post.created_at)
+        for post in posts
+    ]
+
+    with transaction.atomic():
+        TimelineEntry.objects.filter(owner=owner).delete()
+        TimelineEntry.objects.bulk_create(entries, batch_size=TIMELINE_BATCH_SIZE)
+    return len(entries)
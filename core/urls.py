@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import views, async_views, api_views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -14,4 +14,8 @@ urlpatterns = [
     path('signup', views.signup, name='signup'),
     path('signin', views.signin, name='signin'),
     path('logout', views.logout, name='logout'),
+    # coroutine variants of the read heavy views for ASGI deployments
+    path('async/', async_views.index, name='index-async'),
+    path('async/profile/<str:pk>', async_views.profile, name='profile-async'),
+    path('api/feed', api_views.feed_page, name='feed-api'),
 ]
\ No newline at end of file
@@ -1,90 +1,85 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.models import User, auth
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
-from itertools import chain
-import random
+from django.db import transaction, IntegrityError
 
 from .models import Profile, Post, LikePost, FollowersCount
+from . import timeline, feed, suggestions, counters, likes, search_index, images, fragments, auth_cache, cleanup, blobs, passwords
+from .loaders import profile_loader
 
 @login_required(login_url='signin')
 def index(request):
     """
-    Based on info of logged in user finds its following users, posts of these users  
+    Based on info of logged in user reads one page of posts of its following users.
+    Pages are keyset paginated, GET param 'before' holds id of the last post of the previous page
 
     :param request: contains info  about logged in user
     :type request: {
         user: {
             username: string
+        },
+        GET: {
+            before: string,
+            mode: 'latest' or 'top', newest posts or highest decaying like score first
         }
     }
     :return: renders index.html template with info of object: {
         user_profile: Profile of logged in user,
-        posts: array of posts of subscripted profiles,
+        posts: page of posts of subscripted profiles, newest or top ranked first,
+        feed_mode: mode of the page,
+        next_before: id of the last post on the page if older posts exist,
+        next_cursor: feed API cursor of the following page if older posts exist,
+        feed_page_key: key the rendered page is cached under,
         suggestions_username_profile_list: profiles, which are not followed by current user,
+            sampled from precomputed friends of friends and most followed users,
     } 
     :type return: {
         user_profile: ProfileModel;
         posts: PostModel[];
+        feed_mode: string;
+        next_before: string or None;
+        next_cursor: string or None;
+        feed_page_key: string;
         suggestions_username_profile_list: Profile[]
     }
     :raises Unauthorized
     """
-    user_object = User.objects.get(username=request.user.username)
-    user_profile = Profile.objects.get(user=user_object)
-
-    user_following_list = []
-    feed = []
-
-    user_following = FollowersCount.objects.filter(follower=request.user.username)
-    for users in user_following:
-        user_following_list.append(users.user)
-
-    for usernames in user_following_list:
-        feed_lists = Post.objects.filter(user=usernames)
-        feed.append(feed_lists)
-
-    feed_list = list(chain(*feed))
-
-    all_users = User.objects.all()
-    user_following_all = []
-
-    for user in user_following:
-        user_list = User.objects.get(username=user.user)
-        user_following_all.append(user_list)
-
-    new_suggestions_list = [x for x in list(all_users) if x not in list(user_following_all)]
-    current_user = User.objects.filter(username=request.user.username)
-    final_suggestions_list =  [x for x in list(new_suggestions_list) if x not in list(current_user)]
-    random.shuffle(final_suggestions_list)
-
-    username_profile = []
-    username_profile_list = []
-
-    for users in final_suggestions_list:
-        username_profile.append(users.id)
-
-    for ids in username_profile:
-        profile_lists = Profile.objects.filter(id_user=ids)
-        username_profile_list.append(profile_lists)
-
-    suggestions_username_profile_list = list(chain(*username_profile_list))
-
-    posts = Post.objects.all()
+    user_object = request.user
+    loader = profile_loader(request)
+    # the viewer profile is loaded in the same query as the suggested ones
+    loader.queue(usernames=[user_object.username])
+
+    before = request.GET.get('before')
+    mode = feed.parse_mode(request.GET.get('mode'))
+    # only the first screen, scrolling fetches the following pages from the feed API
+    try:
+        feed_list, next_before = feed.page(user_object, before, feed.FEED_FIRST_SCREEN_SIZE, mode)
+    except ValueError:
+        # there are no posts after a post which does not exist, restarting at the newest page would repeat them
+        feed_list, next_before = [], None
+    feed_list = likes.buffer.merge_pending(feed_list)
+
+    suggestions_username_profile_list = suggestions.suggestions_for(user_object.username, loader=loader)
+    user_profile = loader.get(username=user_object.username)
 
     return render(request, 'index.html',
                   {
                       'user_profile': user_profile,
                       'posts': feed_list,
-                      'suggestions_username_profile_list': suggestions_username_profile_list[:4]
+                      'feed_mode': mode,
+                      'next_before': next_before,
+                      'next_cursor': feed.encode_cursor(next_before),
+                      'feed_page_key': fragments.feed_page_key(user_object.username, before, feed_list),
+                      'suggestions_username_profile_list': suggestions_username_profile_list
                   }
                   )
 
 @login_required(login_url='signin')
 def upload(request):
     """
-    Uploads new post
+    Uploads new post, resized variants of its image are generated in the background
 
     :param request: contains info  about logged in user
     :type request: {
@@ -107,8 +102,16 @@ def upload(request):
         image = request.FILES.get('image_upload')
         caption = request.POST['caption']
 
-        new_post = Post.objects.create(user=user, image=image, caption=caption)
-        new_post.save()
+        with transaction.atomic():
+            new_post = Post.objects.create(user_id=user, image=image, caption=caption)
+            blobs.retain(new_post.image.name)
+            counters.adjust(user, posts_count=1)
+            # resized variants are generated in a process pool once the post is committed
+            images.process_post_image(new_post)
+            fragments.invalidate(('author', user))
+
+        # push the post into timelines of the author's followers
+        timeline.fan_out(new_post)
 
         return redirect('/')
 
@@ -118,48 +121,60 @@ def upload(request):
 @login_required(login_url='signin')
 def search(request):
     """
-    Implements search user by username functionality
+    Implements search user by username functionality.
+    Profiles are looked up through the username trigram index and returned page by page
 
     :param request: contains dictionary user with username inside,
                 and object POST with key 'username' which is a search query
+                and optional key 'page' with number of the result page
     :type request: {
         user: {
             username: string
+        },
+        POST: {
+            username: string,
+            page: string
         }
     }
     :renders: search.html template with info of object: {
         user_profile: Profile of logged in user,
-        username_profile_list: list of profiles whose usernames contains search query
+        username: search query,
+        username_profile_list: page of profiles whose usernames contains search query,
+        page: number of the page,
+        has_next_page: whether more results exist
     } 
     :type renders: {
         user_profile: ProfileModel;
+        username: string;
         username_profile_list: ProfileModel[];
+        page: number;
+        has_next_page: boolean;
     }
     :raises BadRequest or Unauthorized
     """
-    user_object = User.objects.get(username=request.user.username)
-    user_profile = Profile.objects.get(user=user_object)
+    user_profile = profile_loader(request).get(user_id=request.user.id)
+
+    username = ''
+    page = 1
+    username_profile_list = []
+    has_next_page = False
 
     if request.method == 'POST':
         username = request.POST['username']
-        username_object = User.objects.filter(username__icontains=username)
-
-        username_profile = []
-        username_profile_list = []
-
-        for users in username_object:
-            username_profile.append(users.id)
-
-        for ids in username_profile:
-            profile_lists = Profile.objects.filter(id_user=ids)
-            username_profile_list.append(profile_lists)
+        try:
+            page = max(int(request.POST.get('page', 1)), 1)
+        except ValueError:
+            page = 1
 
-        username_profile_list = list(chain(*username_profile_list))
+        username_profile_list, has_next_page = search_index.search_profiles(username, page)
 
     return render(request, 'search.html',
                   {
                       'user_profile': user_profile,
+                      'username': username,
                       'username_profile_list': username_profile_list,
+                      'page': page,
+                      'has_next_page': has_next_page,
                   }
                   )
 
@@ -167,7 +182,7 @@ def search(request):
 def like_post(request):
     """
     Implements like post functionality. Increments count of likes if user has not liked the post,
-    and decrements if user has.
+    and decrements if user has. Count changes are buffered and flushed to the post in batches
 
     :param request: contains info  about logged in user
             ans GET param key with property 'post_id'
@@ -185,25 +200,29 @@ def like_post(request):
     username = request.user.username
     post_id = request.GET.get('post_id')
 
-    post = Post.objects.get(id=post_id)
+    post = Post.objects.only('id').get(id=post_id)
 
-    like_filter = LikePost.objects.filter(post_id=post_id, username=username).first()
+    unliked, _ = LikePost.objects.filter(post=post, user_id=username).delete()
 
-    if like_filter == None:
-        new_like = LikePost.objects.create(post_id=post_id, username=username)
-        new_like.save()
-        post.no_of_likes = post.no_of_likes + 1
-        post.save()
+    # the like counter is buffered and written behind in batches, see core.likes
+    if unliked:
+        likes.buffer.add(post.id, -1)
     else:
-        like_filter.delete()
-        post.no_of_likes = post.no_of_likes - 1
-        post.save()
+        try:
+            with transaction.atomic():
+                LikePost.objects.create(post=post, user_id=username)
+        except IntegrityError:
+            # a concurrent request has liked the post already, unique_like keeps one like
+            pass
+        else:
+            likes.buffer.add(post.id, 1)
+    fragments.invalidate(('post', post.id))
     return redirect('/')
 
 @login_required(login_url='signin')
 def delete_post(request):
     """
-    Deletes post
+    Marks post as deleted, its likes, timeline entries and image files are removed in the background
 
     :param request: contains id of post with key 'post_id'
     :type request: {
@@ -216,7 +235,11 @@ def delete_post(request):
     """
     post_id = request.POST.get('post_id')
 
-    Post.objects.filter(id=post_id).delete()
+    with transaction.atomic():
+        author = cleanup.delete_post(post_id)
+        if author is not None:
+            counters.adjust(author, posts_count=-1)
+            fragments.invalidate(('author', author))
 
     return redirect('/')
 
@@ -225,7 +248,8 @@ def profile(request, pk):
     """
     Returns profile with specific username of logged in user,
     returns all posts of that user,
-    and who is following him and who is followed by him
+    and who is following him and who is followed by him.
+    Amounts are read from denormalized counters of the profile
 
     :param request: contains user object with username;
             pk: name of logged in user
@@ -239,6 +263,7 @@ def profile(request, pk):
         user_object: current user;
         user_profile: profile with username;
         user_posts: posts of user;
+        post_grid_key: key the rendered grid of posts is cached under;
         user_post_length: length of posts;
         button_text: text for subscribe button;
         user_followers: amount of followers;
@@ -248,6 +273,7 @@ def profile(request, pk):
         user_object: UserModel;
         user_profile: ProfileModel;
         user_posts: PostModel[];
+        post_grid_key: string;
         user_post_length: number;
         button_text: string;
         user_followers: number;
@@ -255,10 +281,10 @@ def profile(request, pk):
     }
     :raises BadRequest or Unauthorized
     """
-    user_object = User.objects.get(username=pk)
-    user_profile = Profile.objects.get(user=user_object)
-    user_posts = Post.objects.filter(user=pk)
-    user_post_length = len(user_posts)
+    user_profile = profile_loader(request).get(username=pk)
+    user_object = user_profile.user
+    user_posts = likes.buffer.merge_pending(Post.objects.filter(user=pk))
+    user_post_length = user_profile.posts_count
 
     follower = request.user.username
     user = pk
@@ -268,12 +294,13 @@ def profile(request, pk):
     else:
         button_text = 'Follow'
 
-    user_followers = len(FollowersCount.objects.filter(user=pk))
-    user_following = len(FollowersCount.objects.filter(follower=pk))
+    user_followers = user_profile.followers_count
+    user_following = user_profile.following_count
     context = {
         'user_object': user_object,
         'user_profile': user_profile,
         'user_posts': user_posts,
+        'post_grid_key': fragments.post_grid_key(pk),
         'user_post_length': user_post_length,
         'button_text': button_text,
         'user_followers': user_followers,
@@ -285,7 +312,8 @@ def profile(request, pk):
 @login_required(login_url='signin')
 def follow(request):
     """
-    Implements follow functionality
+    Implements follow functionality.
+    Counters of both users and the timeline of the follower are updated by queued tasks
 
     :param request: contains info  about logged in user,
             and user he or she wants to follow
@@ -298,18 +326,27 @@ def follow(request):
     :redirects: 
         1) to profile + username page if request.method == "POST"
         2) to / if request.method == "GET"
-    :raises BadRequest or Unauthorized 
+    :raises BadRequest or Unauthorized, Http404 if the user to follow does not exist 
     """
     if request.method == 'POST':
         follower = request.POST['follower']
         user = request.POST['user']
 
-        if FollowersCount.objects.filter(follower=follower, user=user).first():
-            delete_follower = FollowersCount.objects.get(follower=follower, user=user)
-            delete_follower.delete()
-        else:
-            new_follower = FollowersCount.objects.create(follower=follower, user=user)
-            new_follower.save()
+        get_object_or_404(User.objects.only('id'), username=user)
+
+        with transaction.atomic():
+            unfollowed, _ = FollowersCount.objects.filter(follower=follower, user=user).delete()
+            if not unfollowed:
+                try:
+                    with transaction.atomic():
+                        FollowersCount.objects.create(follower_id=follower, user_id=user)
+                except IntegrityError:
+                    # a concurrent request has followed the user already, unique_follow keeps one row
+                    pass
+            # counters and the follower's timeline are brought up to date by the task queue, see core.tasks
+            counters.recount(follower, user)
+            timeline.sync_follow(follower, user)
+        suggestions.refresh(follower)
         return redirect('/profile/' + user)
 
     else:
@@ -319,7 +356,8 @@ def follow(request):
 def settings(request):
     """
     If user wants to get settings page, it redirects to /settings page with info about logged in profile
-    If user wants to post settings page, it gets all info from submitted form and changes info in profile model 
+    If user wants to post settings page, it gets all info from submitted form and changes info in profile model.
+    A thumbnail of a new profile image is generated in the background
 
     :param request: contains username of logged in user
     :type request: {
@@ -333,21 +371,36 @@ def settings(request):
     }
     :raises BadRequest or Unauthorized
     """
-    user_profile = Profile.objects.get(user=request.user)
+    user_profile = profile_loader(request).get(user_id=request.user.id)
     if request.method == 'POST':
         requestImage = request.FILES.get('image')
         if requestImage == None:
             image = user_profile.profileimg
         elif requestImage != None:
             image = requestImage
+            replaced = [user_profile.profileimg.name, user_profile.profileimg_thumbnail.name]
 
         bio = request.POST['bio']
         location = request.POST['location']
         user_profile.profileimg = image
         user_profile.bio = bio
         user_profile.location = location
-
-        user_profile.save()
+        changed_fields = ['profileimg', 'bio', 'location']
+        if requestImage != None:
+            # the old thumbnail is stale until the new one is generated
+            user_profile.profileimg_thumbnail = ''
+            user_profile.profileimg_widths = {}
+            changed_fields += ['profileimg_thumbnail', 'profileimg_widths']
+
+        # the profile may come from the auth cache, saving every field could undo concurrent counter updates
+        with transaction.atomic():
+            user_profile.save(update_fields=changed_fields)
+            if requestImage != None:
+                blobs.retain(user_profile.profileimg.name)
+                blobs.release(*replaced)
+        fragments.invalidate(('author', request.user.username))
+        if requestImage != None:
+            images.process_profile_image(user_profile)
 
         return redirect('settings')
 
@@ -355,6 +408,17 @@ def settings(request):
         'user_profile': user_profile,
     })
 
+def _overloaded(request, template):
+    """
+    Answers sign ins and sign ups while the password hashing pool is saturated
+
+    :renders: template with status 503 and Retry-After
+    """
+    messages.info(request, 'Too many sign ins right now, please try again in a few seconds')
+    response = render(request, template, status=503)
+    response['Retry-After'] = passwords.PASSWORD_HASHING_RETRY_AFTER
+    return response
+
 def signup(request):
     """
     Implements sign up functionality
@@ -392,17 +456,23 @@ def signup(request):
                 messages.info(request, 'Username Already Taken')
                 return redirect('signup')
             else:
-                user = User.objects.create_user(username=username, email=email, password=password)
-                user.save()
+                try:
+                    password_hash = passwords.make(password)
+                except passwords.HashingOverloaded:
+                    return _overloaded(request, 'signup.html')
+                # the password is hashed once, the new user is logged in without authenticating again
+                user = User.objects.create(
+                    username=User.normalize_username(username),
+                    email=User.objects.normalize_email(email),
+                    password=password_hash,
+                )
+                search_index.index_user(user)
 
                 # log user in and redirect to settings page
-                user_login = auth.authenticate(username=username, password=password)
-                auth.login(request, user_login)
+                auth.login(request, user, backend='core.auth_cache.CachedModelBackend')
 
                 # create a Profile object for the new user
-                user_model = User.objects.get(username=username)
-                new_profile = Profile.objects.create(user=user_model, id_user=user_model.id)
-                new_profile.save()
+                Profile.objects.create(user=user, id_user=user.id)
                 return redirect('settings')
 
         else:
@@ -428,7 +498,10 @@ def signin(request):
         username = request.POST['username']
         password = request.POST['password']
 
-        user = auth.authenticate(username=username, password=password)
+        try:
+            user = auth.authenticate(username=username, password=password)
+        except passwords.HashingOverloaded:
+            return _overloaded(request, 'signin.html')
 
         if (user is not None):
             auth.login(request, user)
@@ -451,5 +524,7 @@ def logout(request):
     :redirects: /signin
     :raises BadRequest or Unauthorized
     """
+    auth_cache.invalidate_user(request.user.id)
+    auth_cache.invalidate_profile(request.user.username)
     auth.logout(request)
     return redirect('/signin')
\ No newline at end of file
@@ -42,23 +42,33 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'social_media_app.urls'
 
+# Templates live in the template directories of the apps only. The cached loader compiles every template
+# once per process, the development server resets it whenever a template changes.
+# TEMPLATE_WARMUP compiles all core templates at startup, so no request pays for it
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
+        'DIRS': [],
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -69,8 +79,35 @@ TEMPLATES = [
     },
 ]
 
+TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', '0' if DEBUG else '1') == '1'
+
 WSGI_APPLICATION = 'social_media_app.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.QueryBudgetTestRunner'
+
+
+# Request metrics and query budgets, see core/middleware.py
+# Maximal amount of SQL queries per request of a URL name, exceeding it logs a warning
+# and fails the test suite
+
+QUERY_BUDGETS = {
+    'index': 12,
+    'index-async': 12,
+    'feed-api': 6,
+    'profile': 8,
+    'profile-async': 8,
+    'search': 6,
+    'settings': 8,
+    'upload': 12,
+    'like-post': 11,
+    'follow': 16,
+    'delete-post': 10,
+}
+
+QUERY_BUDGET_STRICT = False
+
+REQUEST_METRICS_HEADERS = DEBUG
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -79,9 +116,66 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # connections are kept open between requests, see core/sqlite.py for the pragmas applied to them
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replica, reads of REPLICA_VIEWS are routed to it by core.routers.ReplicaRouter.
+# A second SQLite file refreshed with `manage.py sync_replica` can stand in for it
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+REPLICA_VIEWS = ('index', 'index-async', 'feed-api', 'profile', 'profile-async', 'search')
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# 'fragments' holds rendered template fragments, see core/fragments.py. LocMemCache evicts the least
+# recently used entries past MAX_ENTRIES, point FRAGMENT_CACHE_BACKEND and FRAGMENT_CACHE_LOCATION
+# at memcached or redis to share fragments between worker processes.
+# manage.py run_tasks refuses to start while either cache is local to a process, its invalidations would not reach the web processes
+
+FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DEFAULT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DEFAULT_CACHE_LOCATION', ''),
+    },
+    'fragments': {
+        'BACKEND': FRAGMENT_CACHE_BACKEND,
+        'LOCATION': os.environ.get('FRAGMENT_CACHE_LOCATION', 'fragments'),
+        'TIMEOUT': 24 * 60 * 60,
+    },
+}
+
+if FRAGMENT_CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['fragments']['OPTIONS'] = {'MAX_ENTRIES': 5000}
+
+
+# Sessions and authentication
+# https://docs.djangoproject.com/en/4.2/topics/http/sessions/#configuring-the-session-engine
+# Sessions, logged in users and their profiles are read from the 'default' cache, see core/auth_cache.py.
+# Behind several worker processes DEFAULT_CACHE_BACKEND has to be a shared cache like memcached or redis.
+# SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies keeps sessions out of the server entirely
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+AUTHENTICATION_BACKENDS = [
+    'core.auth_cache.CachedModelBackend',
+    # sessions created before CachedModelBackend still name this one, it only serves their get_user,
+    # CachedModelBackend ends every signin before it is asked
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -129,4 +223,9 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# How uploaded media bodies are sent by core.media.serve: None streams them from python
+# (sendfile() through wsgi.file_wrapper), 'x-accel-redirect' hands them to nginx, 'x-sendfile' to apache
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
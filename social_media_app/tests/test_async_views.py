@@ -0,0 +1,42 @@
+from django.test import TestCase, AsyncClient
+from django.contrib.auth.models import User
+
+from core.models import Profile, Post, FollowersCount
+from core import timeline
+
+
+class TestAsyncViews(TestCase):
+    def setUp(self):
+        for username in ('TestUser', 'AnotherUser'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.user = User.objects.get(username='TestUser')
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+        Profile.objects.filter(user__username='AnotherUser').update(followers_count=1, posts_count=1)
+        Post.objects.create(user_id='AnotherUser', caption='Some Caption', image='post_images/credit-cards.png')
+        timeline.rebuild(self.user)
+        self.client = AsyncClient()
+        self.client.force_login(self.user)
+
+    async def test_redirects_anonymous_users(self):
+        response = await AsyncClient().get('/async/')
+
+        self.assertEquals(response.status_code, 302)
+        self.assertTrue(response.url.startswith('/signin'))
+
+    async def test_index(self):
+        response = await self.client.get('/async/')
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals([post.caption for post in response.context['posts']], ['Some Caption'])
+        self.assertEquals(len(response.context['suggestions_username_profile_list']), 0)
+        self.assertTrue(response.asgi_request.metrics.queries > 0)
+
+    async def test_profile(self):
+        response = await self.client.get('/async/profile/AnotherUser')
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context['button_text'], 'Unfollow')
+        self.assertEquals(response.context['user_followers'], 1)
+        self.assertEquals(response.context['user_post_length'], 1)
+        self.assertEquals(len(response.context['user_posts']), 1)
@@ -0,0 +1,73 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from core.models import Profile
+from core import counters, likes, tasks
+
+
+class TestCachedAuthentication(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(likes.buffer.drain)
+        for username in ('TestUser', 'AnotherUser'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.client = Client()
+        self.client.login(username='TestUser', password='testpassword')
+
+    def test_user_and_profile_come_from_cache(self):
+        self.client.get(reverse('settings'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('settings'))
+        self.assertEquals(response.context['user_profile'].user.username, 'TestUser')
+
+    def test_settings_refresh_cached_profile(self):
+        self.client.get(reverse('settings'))
+
+        self.client.post(reverse('settings'), {'bio': 'New bio', 'location': 'Somewhere'})
+
+        response = self.client.get(reverse('settings'))
+        self.assertEquals(response.context['user_profile'].bio, 'New bio')
+        self.assertEquals(response.context['user_profile'].location, 'Somewhere')
+
+    def test_follow_refreshes_cached_counters(self):
+        self.client.get(reverse('settings'))
+
+        self.client.post(reverse('follow'), {'follower': 'TestUser', 'user': 'AnotherUser'})
+        tasks.run_pending()
+
+        response = self.client.get(reverse('settings'))
+        self.assertEquals(response.context['user_profile'].following_count, 1)
+
+    def test_password_change_ends_cached_session(self):
+        self.client.get(reverse('settings'))
+
+        user = User.objects.get(username='TestUser')
+        user.set_password('otherpassword')
+        user.save()
+
+        response = self.client.get(reverse('settings'))
+        self.assertEquals(response.status_code, 302)
+
+    def test_logout_drops_cached_user(self):
+        self.client.get(reverse('settings'))
+        user = User.objects.get(username='TestUser')
+        self.assertIsNotNone(cache.get(f'auth-user:{user.id}'))
+
+        self.client.get(reverse('logout'))
+
+        self.assertIsNone(cache.get(f'auth-user:{user.id}'))
+        self.assertIsNone(cache.get('auth-profile:TestUser'))
+
+    def test_profile_cached_before_commit_is_dropped_on_commit(self):
+        user = User.objects.get(username='TestUser')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.adjust('TestUser', followers_count=1)
+            # a concurrent request still reads the uncommitted row and caches it
+            cache.set('auth-profile:TestUser', Profile.objects.get(user=user))
+
+        self.assertIsNone(cache.get('auth-profile:TestUser'))
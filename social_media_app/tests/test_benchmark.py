@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
+
+from core.models import Profile, Post, LikePost, FollowersCount, TimelineEntry
+from core import benchmark
+
+
+class TestSeedData(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def seed(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command('seed_data', users=30, seed=7, stdout=StringIO())
+        return (
+            User.objects.count(),
+            FollowersCount.objects.count(),
+            sorted(str(post_id) for post_id in Post.objects.values_list('id', flat=True)),
+            LikePost.objects.count(),
+        )
+
+    def test_seeding_is_deterministic(self):
+        first = self.seed()
+        Post.objects.all().delete()
+        LikePost.objects.all().delete()
+        FollowersCount.objects.all().delete()
+        User.objects.all().delete()
+
+        self.assertEquals(self.seed(), first)
+
+    def test_derived_data_is_built(self):
+        self.seed()
+
+        self.assertEquals(Profile.objects.count(), 30)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEquals(
+            sum(Profile.objects.values_list('posts_count', flat=True)),
+            Post.objects.count(),
+        )
+
+
+class TestBenchmarkReport(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEquals(benchmark.percentile(values, 50), 50)
+        self.assertEquals(benchmark.percentile(values, 99), 99)
+        self.assertEquals(benchmark.percentile([5], 95), 5)
+
+    def test_compare(self):
+        baseline = {'routes': {'index': {'requests': 10, 'p95_ms': 100.0, 'queries_per_request': 8}}}
+        current = {'routes': {'index': {'requests': 10, 'p95_ms': 50.0, 'queries_per_request': 8}}}
+
+        self.assertEquals(
+            benchmark.compare(baseline, current),
+            {'index': {'p95_ms': -0.5, 'queries_per_request': 0.0}},
+        )
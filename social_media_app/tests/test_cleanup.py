@@ -0,0 +1,111 @@
+import io
+import os
+import tempfile
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from core.models import Profile, Post, LikePost, FollowersCount, TimelineEntry, Task
+from core import cleanup, timeline, tasks
+
+
+class TestPostCleanup(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media = media.name
+        os.makedirs(os.path.join(self.media, 'post_images', 'variants'))
+
+        for username in ('TestUser', 'AnotherUser', 'Liker0', 'Liker1', 'Liker2'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.client = Client()
+        self.client.force_login(User.objects.get(username='TestUser'))
+
+        FollowersCount.objects.create(follower_id='AnotherUser', user_id='TestUser')
+        self.post = self.create_post('post_images/deleted.png', 'post_images/variants/deleted_thumbnail.webp')
+        self.shared = self.create_post('post_images/shared.png')
+        Post.objects.create(user_id='AnotherUser', caption='Same image', image='post_images/shared.png')
+        for username in ('Liker0', 'Liker1', 'Liker2'):
+            LikePost.objects.create(post=self.post, user_id=username)
+        timeline.rebuild(User.objects.get(username='AnotherUser'))
+
+    def create_post(self, image, thumbnail=''):
+        for name in (image, thumbnail):
+            if name:
+                with open(os.path.join(self.media, name), 'wb') as file:
+                    file.write(b'image')
+        post = Post.objects.create(user_id='TestUser', caption='Some Caption', image=image, image_thumbnail=thumbnail)
+        Profile.objects.filter(user__username='TestUser').update(posts_count=2)
+        return post
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media, name))
+
+    def test_delete_hides_post_at_once(self):
+        # the cleanup job is not run, it would only start once the transaction commits
+        with self.captureOnCommitCallbacks():
+            self.client.post('/delete-post', {'post_id': self.post.id})
+
+        self.assertFalse(Post.objects.filter(id=self.post.id).exists())
+        self.assertTrue(Post.all_objects.filter(id=self.post.id).exists())
+        self.assertEquals(Profile.objects.get(user__username='TestUser').posts_count, 1)
+        owner = User.objects.get(username='AnotherUser')
+        self.assertNotIn(self.post.id, [post.id for post in timeline.read(owner)])
+
+    def test_purge_removes_likes_entries_and_files(self):
+        cleanup.delete_post(self.post.id)
+
+        self.assertEquals(cleanup.purge_post(self.post.id, batch_size=2), 3)
+
+        self.assertFalse(Post.all_objects.filter(id=self.post.id).exists())
+        self.assertFalse(LikePost.objects.exists())
+        self.assertFalse(TimelineEntry.objects.filter(post_id=self.post.id).exists())
+        self.assertFalse(self.exists('post_images/deleted.png'))
+        self.assertFalse(self.exists('post_images/variants/deleted_thumbnail.webp'))
+
+    def test_purge_keeps_shared_files(self):
+        cleanup.delete_post(self.shared.id)
+        cleanup.purge_post(self.shared.id)
+
+        self.assertTrue(self.exists('post_images/shared.png'))
+
+    def test_sweep_orphans(self):
+        Post.objects.filter(id=self.post.id).update(deleted_at='2023-11-01T00:00:00Z')
+        with open(os.path.join(self.media, 'post_images', 'orphan.png'), 'wb') as file:
+            file.write(b'image')
+
+        out = io.StringIO()
+        call_command('sweep_orphans', batch_size=2, grace=0, stdout=out)
+
+        self.assertIn('Purged 1 deleted posts with 3 likes', out.getvalue())
+        self.assertFalse(Post.all_objects.filter(id=self.post.id).exists())
+        self.assertFalse(self.exists('post_images/orphan.png'))
+        self.assertFalse(self.exists('post_images/deleted.png'))
+        self.assertTrue(self.exists('post_images/shared.png'))
+
+    def test_sweep_keeps_recent_files(self):
+        with open(os.path.join(self.media, 'post_images', 'uploading.png'), 'wb') as file:
+            file.write(b'image')
+
+        call_command('sweep_orphans', stdout=io.StringIO())
+
+        self.assertTrue(self.exists('post_images/uploading.png'))
+
+    def test_workers_sweep_orphans_periodically(self):
+        orphan = os.path.join(self.media, 'post_images', 'orphan.png')
+        with open(orphan, 'wb') as file:
+            file.write(b'image')
+        os.utime(orphan, (0, 0))
+
+        tasks.autodiscover()
+        tasks.schedule_periodic()
+        tasks.run_pending()
+
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(self.exists('post_images/shared.png'))
+        self.assertEquals(Task.objects.get(name='cleanup.sweep_orphaned_files').status, Task.QUEUED)
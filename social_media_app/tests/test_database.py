@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.db import connection
+
+from core.models import Profile, Post
+from core import routers, likes
+
+
+class TestSqlitePragmas(TestCase):
+    def test_pragmas_are_applied_to_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEquals(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEquals(cursor.fetchone()[0], 5000)
+
+
+@mock.patch('core.routers.replica_configured', return_value=True)
+class TestReplicaRouting(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='TestUser', password='testpassword')
+        Profile.objects.create(user=user, id_user=user.id)
+        self.post = Post.objects.create(user_id='TestUser', caption='Some Caption', image='post_images/credit-cards.png')
+        self.client = Client()
+        self.client.force_login(user)
+        # likes of posts rolled back with the test must not stay buffered
+        self.addCleanup(likes.buffer.drain)
+
+    def routed_to_replica(self, method, path, data=None):
+        routed = []
+
+        def record(*args, **kwargs):
+            routed.append(routers.reads_from_replica())
+            return None
+
+        with mock.patch.object(routers.ReplicaRouter, 'db_for_read', side_effect=record, autospec=True):
+            getattr(self.client, method)(path, data or {})
+        return routed
+
+    def test_router(self, replica_configured):
+        router = routers.ReplicaRouter()
+        token = routers.use_replica(True)
+        try:
+            self.assertEquals(router.db_for_read(Post), routers.REPLICA_DATABASE)
+            self.assertEquals(router.db_for_write(Post), 'default')
+        finally:
+            routers.reset_replica(token)
+        self.assertIsNone(router.db_for_read(Post))
+        self.assertFalse(router.allow_migrate(routers.REPLICA_DATABASE, 'core'))
+
+    def test_read_only_views_read_from_replica(self, replica_configured):
+        routed = self.routed_to_replica('get', '/profile/TestUser')
+
+        # the session and the user are read from the default database before the view runs
+        self.assertFalse(routed[0])
+        self.assertTrue(routed[-1])
+
+    def test_writing_views_read_from_default(self, replica_configured):
+        routed = self.routed_to_replica('get', '/like-post', {'post_id': self.post.id})
+
+        self.assertFalse(any(routed))
+        self.assertFalse(routers.reads_from_replica())
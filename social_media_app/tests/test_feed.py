@@ -0,0 +1,143 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+
+from core.models import Profile, Post, FollowersCount
+from core import feed, timeline, likes, cleanup
+
+
+class TestFeed(TestCase):
+    def setUp(self):
+        self.client = Client()
+        for username in ('TestUser', 'AnotherUser'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.user = User.objects.get(username='TestUser')
+        self.client.force_login(self.user)
+        # likes of posts rolled back with the test must not stay buffered
+        self.addCleanup(likes.buffer.drain)
+
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+        start = datetime(2023, 11, 1, tzinfo=timezone.utc)
+        Post.objects.bulk_create([
+            Post(user_id='AnotherUser', caption=f'Post {i}', image='post_images/credit-cards.png',
+                 created_at=start + timedelta(minutes=i))
+            for i in range(3 * feed.FEED_PAGE_SIZE)
+        ])
+        timeline.rebuild(self.user)
+
+    def get_page(self, before=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/', {'before': before} if before else {})
+        return response, len(queries)
+
+    def test_pages_do_not_overlap(self):
+        seen = []
+        before = None
+        while True:
+            response, _ = self.get_page(before)
+            seen.extend(post.caption for post in response.context['posts'])
+            before = response.context['next_before']
+            if before is None:
+                break
+
+        self.assertEquals(len(seen), 3 * feed.FEED_PAGE_SIZE)
+        self.assertEquals(len(set(seen)), len(seen))
+        self.assertEquals(seen[0], f'Post {3 * feed.FEED_PAGE_SIZE - 1}')
+
+    def test_deep_page_costs_the_same_queries(self):
+        first, _ = self.get_page()
+        second, shallow_queries = self.get_page(first.context['next_before'])
+        third, deep_queries = self.get_page(second.context['next_before'])
+
+        self.assertEquals(len(third.context['posts']), feed.FEED_FIRST_SCREEN_SIZE)
+        self.assertEquals(shallow_queries, deep_queries)
+
+    def test_unmaterialized_feed_is_one_query(self):
+        with mock.patch('core.feed.FEED_MATERIALIZED', False):
+            posts, next_before = feed.page(self.user)
+            # cursor lookup plus the feed query itself
+            with self.assertNumQueries(2):
+                older, _ = feed.page(self.user, next_before)
+
+        self.assertEquals(len(posts), feed.FEED_PAGE_SIZE)
+        self.assertTrue(older[0].created_at < posts[-1].created_at)
+
+
+    def test_api_pages_follow_first_screen(self):
+        response = self.client.get('/')
+        seen = [post.caption for post in response.context['posts']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            page = self.client.get('/api/feed', {'cursor': cursor}).json()
+            seen.extend(post['caption'] for post in page['posts'])
+            cursor = page['next_cursor']
+
+        self.assertEquals(len(response.context['posts']), feed.FEED_FIRST_SCREEN_SIZE)
+        self.assertEquals(seen, [f'Post {i}' for i in reversed(range(3 * feed.FEED_PAGE_SIZE))])
+
+    def test_api_serializes_posts_compactly(self):
+        post = self.client.get('/api/feed').json()['posts'][0]
+
+        self.assertEquals(
+            set(post), {'id', 'author', 'thumbnail', 'caption', 'likes', 'created_at'}
+        )
+        self.assertEquals(post['author'], 'AnotherUser')
+        self.assertEquals(post['thumbnail'], '/media/post_images/credit-cards.png')
+
+    def test_api_answers_unchanged_pages_with_304(self):
+        first = self.client.get('/api/feed')
+
+        unchanged = self.client.get('/api/feed', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEquals(unchanged.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/like-post', {'post_id': first.json()['posts'][0]['id']})
+        changed = self.client.get('/api/feed', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEquals(changed.status_code, 200)
+        self.assertEquals(changed.json()['posts'][0]['likes'], 1)
+
+    def test_page_after_deleted_post_continues(self):
+        posts, next_before = feed.page(self.user)
+        cleanup.delete_post(next_before)
+
+        older, _ = feed.page(self.user, next_before)
+
+        self.assertEquals(older[0].created_at, posts[-1].created_at - timedelta(minutes=1))
+
+    def test_unknown_cursor_post_ends_the_feed(self):
+        cursor = feed.encode_cursor(str(uuid.uuid4()))
+
+        self.assertEquals(self.client.get('/api/feed', {'cursor': cursor}).status_code, 400)
+        response = self.client.get('/', {'before': str(uuid.uuid4())})
+        self.assertEquals(list(response.context['posts']), [])
+        self.assertIsNone(response.context['next_before'])
+
+    def test_pages_continue_past_trimmed_timeline(self):
+        with mock.patch('core.timeline.TIMELINE_MAX_LENGTH', feed.FEED_PAGE_SIZE + 5):
+            timeline.rebuild(self.user)
+
+        seen = []
+        before = None
+        while True:
+            posts, before = feed.page(self.user, before)
+            seen.extend(post.caption for post in posts)
+            if before is None:
+                break
+
+        self.assertEquals(seen, [f'Post {i}' for i in reversed(range(3 * feed.FEED_PAGE_SIZE))])
+
+    def test_api_rejects_forged_cursor(self):
+        response = self.client.get('/api/feed', {'cursor': str(Post.objects.first().id)})
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_api_requires_login(self):
+        self.client.logout()
+
+        self.assertEquals(self.client.get('/api/feed').status_code, 401)
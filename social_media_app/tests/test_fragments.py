@@ -0,0 +1,72 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+from core.models import Profile, Post, FollowersCount
+from core import fragments, timeline, likes
+
+
+class TestFragments(TestCase):
+    def setUp(self):
+        caches[fragments.FRAGMENT_CACHE_ALIAS].clear()
+        for username in ('TestUser', 'Author'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.user = User.objects.get(username='TestUser')
+        FollowersCount.objects.create(follower_id='TestUser', user_id='Author')
+        self.post = Post.objects.create(user_id='Author', caption='Some Caption', image='post_images/credit-cards.png')
+        timeline.rebuild(self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.addCleanup(likes.buffer.drain)
+
+    def test_profile_grid_is_served_from_cache(self):
+        self.client.get('/profile/Author')
+        # changed behind the back of the views, the cached grid is still served
+        Post.objects.filter(id=self.post.id).update(image='post_images/other.png')
+
+        response = self.client.get('/profile/Author')
+
+        self.assertContains(response, 'credit-cards.png')
+        self.assertNotContains(response, 'other.png')
+
+    def test_upload_and_delete_invalidate_author_only(self):
+        author_key = fragments.post_grid_key('Author')
+        viewer_key = fragments.post_grid_key('TestUser')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/upload', {'caption': 'Another Caption'})
+        self.assertEquals(fragments.post_grid_key('Author'), author_key)
+        self.assertNotEqual(fragments.post_grid_key('TestUser'), viewer_key)
+
+        author = Client()
+        author.force_login(User.objects.get(username='Author'))
+        with self.captureOnCommitCallbacks(execute=True):
+            author.post('/delete-post', {'post_id': self.post.id})
+        self.assertNotEqual(fragments.post_grid_key('Author'), author_key)
+
+    def test_like_invalidates_feed_page(self):
+        response = self.client.get('/')
+        self.assertContains(response, 'No likes')
+        key = response.context['feed_page_key']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/like-post', {'post_id': self.post.id})
+        response = self.client.get('/')
+
+        self.assertNotEqual(response.context['feed_page_key'], key)
+        self.assertContains(response, 'Liked by 1 person')
+
+    def test_settings_invalidates_author(self):
+        key = fragments.post_grid_key('TestUser')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/settings', {'bio': 'New bio', 'location': 'Somewhere'})
+
+        self.assertNotEqual(fragments.post_grid_key('TestUser'), key)
+
+    def test_evicted_version_does_not_revive_old_fragments(self):
+        key = fragments.post_grid_key('Author')
+        caches[fragments.FRAGMENT_CACHE_ALIAS].delete('fragment-version:author:Author')
+
+        self.assertNotEqual(fragments.post_grid_key('Author'), key)
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from PIL import Image
+
+from django.test import TestCase, Client
+from django.template import Context, Template
+from django.contrib.auth.models import User
+
+from core.models import Profile, Post, Task
+from core import images, tasks
+
+
+class TestImagePipeline(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, 'post_images'))
+        Image.new('RGB', (2000, 1000), 'pink').save(os.path.join(self.media_root, 'post_images', 'big.png'))
+
+    def test_render_variants(self):
+        variants, widths = images.render_variants(self.media_root, 'post_images/big.png')
+
+        self.assertEquals(set(variants), set(images.IMAGE_VARIANTS))
+        self.assertEquals(widths['original'], 2000)
+        for variant, name in variants.items():
+            with Image.open(os.path.join(self.media_root, name)) as image:
+                self.assertEquals(image.format, images.IMAGE_VARIANT_FORMAT)
+                self.assertEquals(max(image.size), images.IMAGE_VARIANTS[variant])
+                self.assertEquals(widths[variant], image.width)
+
+    def test_render_variants_records_widths_of_portrait_images(self):
+        Image.new('RGB', (500, 1000), 'pink').save(os.path.join(self.media_root, 'post_images', 'tall.png'))
+
+        _, widths = images.render_variants(self.media_root, 'post_images/tall.png')
+
+        self.assertEquals(widths, {'original': 500, 'thumbnail': 160, 'feed': 500})
+
+    def test_upload_queues_variants(self):
+        user = User.objects.create_user(username='TestUser', password='testpassword')
+        Profile.objects.create(user=user, id_user=user.id)
+        client = Client()
+        client.force_login(user)
+
+        with open(os.path.join(self.media_root, 'post_images', 'big.png'), 'rb') as file:
+            client.post('/upload', {'image_upload': file, 'caption': 'Some Caption'})
+
+        post = Post.objects.get(user='TestUser')
+        task = Task.objects.get(name='images.post_variants')
+        self.assertEquals(task.payload, {'post': str(post.pk)})
+        self.assertEquals(task.key, f'post-variants:{post.pk}')
+
+        with mock.patch('core.images._render_all') as render_all:
+            tasks.run_pending()
+        render_all.assert_called_once_with([
+            (Post, post.pk, post.image.name, {'thumbnail': 'image_thumbnail', 'feed': 'image_feed'}, 'image_widths',
+             [('post', post.pk), ('author', 'TestUser')]),
+        ])
+        self.assertFalse(Task.objects.exists())
+        os.remove(post.image.path)
+
+    def test_srcset_skips_missing_variants(self):
+        post = Post(image='post_images/big.png', image_feed='post_images/variants/big_feed.webp',
+                    image_widths={'original': 2000, 'thumbnail': 320, 'feed': 1080})
+
+        rendered = Template(
+            '{% load images %}{% srcset post.image post.image_widths thumbnail=post.image_thumbnail feed=post.image_feed %}'
+        ).render(Context({'post': post}))
+
+        self.assertEquals(rendered, '/media/post_images/variants/big_feed.webp 1080w, /media/post_images/big.png 2000w')
+
+    def test_srcset_uses_recorded_widths(self):
+        post = Post(image='post_images/small.png', image_thumbnail='post_images/variants/small_thumbnail.webp',
+                    image_feed='post_images/variants/small_feed.webp',
+                    image_widths={'original': 300, 'thumbnail': 300, 'feed': 300})
+
+        rendered = Template(
+            '{% load images %}{% srcset post.image post.image_widths thumbnail=post.image_thumbnail feed=post.image_feed %}'
+        ).render(Context({'post': post}))
+
+        self.assertEquals(rendered, '/media/post_images/variants/small_thumbnail.webp 300w')
+
+        post.image_widths = {}
+        self.assertEquals(Template(
+            '{% load images %}{% srcset post.image post.image_widths thumbnail=post.image_thumbnail %}'
+        ).render(Context({'post': post})), '')
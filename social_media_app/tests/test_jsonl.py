@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.models import Profile, Post, LikePost, FollowersCount, TimelineEntry
+
+
+class TestJsonlTransfer(TestCase):
+    def setUp(self):
+        for username in ('TestUser', 'AnotherUser'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id, bio=f'Bio of {username}')
+        User.objects.create_user(username='NoProfile', password='testpassword')
+        self.post = Post.objects.create(user_id='AnotherUser', caption='Some Caption', image='post_images/credit-cards.png')
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+        LikePost.objects.create(post=self.post, user_id='TestUser')
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'export.jsonl')
+
+    def export(self):
+        call_command('export_jsonl', output=self.path, batch_size=2, stderr=io.StringIO())
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def wipe(self):
+        User.objects.all().delete()
+
+    def test_export(self):
+        records = self.export()
+
+        self.assertEquals([record['type'] for record in records], ['user'] * 3 + ['post', 'follow', 'like'])
+        users = {record['username']: record for record in records[:3]}
+        self.assertEquals(users['TestUser']['profile']['bio'], 'Bio of TestUser')
+        self.assertNotIn('profile', users['NoProfile'])
+        self.assertEquals(records[5], {'type': 'like', 'post': str(self.post.id), 'user': 'TestUser'})
+
+    def test_import_restores_export(self):
+        self.export()
+        self.wipe()
+
+        call_command('import_jsonl', self.path, batch_size=2, stdout=io.StringIO())
+
+        self.assertEquals(User.objects.count(), 3)
+        self.assertTrue(User.objects.get(username='TestUser').check_password('testpassword'))
+        self.assertEquals(Post.objects.get(id=self.post.id).caption, 'Some Caption')
+        self.assertTrue(LikePost.objects.filter(post=self.post, user='TestUser').exists())
+        # derived data is rebuilt
+        profile = Profile.objects.get(user__username='AnotherUser')
+        self.assertEquals((profile.followers_count, profile.posts_count), (1, 1))
+        self.assertTrue(TimelineEntry.objects.filter(owner__username='TestUser', post=self.post).exists())
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_import_resumes_after_checkpoint(self):
+        self.export()
+        self.wipe()
+        # users and the post were committed before the import was interrupted
+        call_command('import_jsonl', self.path, batch_size=10, skip_derived=True, stdout=io.StringIO())
+        FollowersCount.objects.all().delete()
+        LikePost.objects.all().delete()
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            file.write('4')
+
+        out = io.StringIO()
+        call_command('import_jsonl', self.path, stdout=out)
+
+        self.assertIn('Resuming after line 4', out.getvalue())
+        self.assertEquals(User.objects.count(), 3)
+        self.assertEquals(Profile.objects.count(), 2)
+        self.assertEquals(FollowersCount.objects.count(), 1)
+        self.assertEquals(LikePost.objects.count(), 1)
+
+    def test_import_is_idempotent(self):
+        self.export()
+
+        call_command('import_jsonl', self.path, stdout=io.StringIO())
+
+        self.assertEquals(User.objects.count(), 3)
+        self.assertEquals(Profile.objects.count(), 2)
+        self.assertEquals(LikePost.objects.count(), 1)
+
+    def test_invalid_line(self):
+        with open(self.path, 'w') as file:
+            file.write('{"type": "comment"}\n')
+
+        with self.assertRaisesMessage(CommandError, "Line 1 has the unknown record type 'comment'"):
+            call_command('import_jsonl', self.path, stdout=io.StringIO())
@@ -0,0 +1,102 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.db import IntegrityError, transaction
+from django.contrib.auth.models import User
+
+from core.models import Post, LikePost, FollowersCount
+from core.likes import LikeCounterBuffer
+
+
+class TestLikeCounterBuffer(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='TestUser', password='testpassword')
+        self.post = Post.objects.create(user_id='TestUser', caption='Viral post')
+
+    def test_concurrent_increments_are_not_lost(self):
+        buffer = LikeCounterBuffer(shards=4, threshold=10 ** 9, interval=10 ** 9)
+        threads_count = 16
+        likes_per_thread = 2000
+        drained = []
+        done = threading.Event()
+
+        def like():
+            for _ in range(likes_per_thread):
+                buffer.add(self.post.id, 1)
+
+        def drain_continuously():
+            while not done.is_set():
+                drained.append(buffer.drain())
+
+        drainer = threading.Thread(target=drain_continuously)
+        drainer.start()
+        threads = [threading.Thread(target=like) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        drainer.join()
+
+        total = sum(batch.get(str(self.post.id), 0) for batch in drained)
+        total += buffer.pending(self.post.id)
+        self.assertEquals(total, threads_count * likes_per_thread)
+
+    def test_flush_writes_with_f_expressions(self):
+        buffer = LikeCounterBuffer(threshold=10 ** 9, interval=10 ** 9)
+        for _ in range(5):
+            buffer.add(self.post.id, 1)
+        buffer.add(self.post.id, -1)
+
+        self.assertEquals(buffer.merge_pending([Post.objects.get(id=self.post.id)])[0].no_of_likes, 4)
+
+        # a concurrent writer changed the row meanwhile, its update must survive
+        Post.objects.filter(id=self.post.id).update(no_of_likes=10)
+        self.assertEquals(buffer.flush(), 1)
+
+        self.assertEquals(Post.objects.get(id=self.post.id).no_of_likes, 14)
+        self.assertEquals(buffer.pending(self.post.id), 0)
+
+    def test_flushes_when_threshold_is_reached(self):
+        buffer = LikeCounterBuffer(threshold=3, interval=10 ** 9)
+        for _ in range(3):
+            buffer.add(self.post.id, 1)
+
+        self.assertEquals(Post.objects.get(id=self.post.id).no_of_likes, 3)
+        self.assertEquals(buffer.pending(self.post.id), 0)
+
+    @override_settings(LIKES_FLUSH_THREAD=True)
+    def test_quiet_buffer_is_flushed_on_a_timer(self):
+        buffer = LikeCounterBuffer(threshold=10 ** 9, interval=0.05)
+        flushed = threading.Event()
+
+        # the thread has its own connection outside the test transaction, flushing is only recorded
+        with mock.patch.object(buffer, 'flush', side_effect=flushed.set):
+            buffer.add(self.post.id, 1)
+            self.assertTrue(flushed.wait(5))
+            # later rounds of the thread find nothing to write
+            buffer.drain()
+
+
+class TestUniqueLikesAndFollows(TestCase):
+    def setUp(self):
+        for username in ('TestUser', 'AnotherUser'):
+            User.objects.create_user(username=username, password='testpassword')
+        self.post = Post.objects.create(user_id='AnotherUser', caption='Some Caption')
+
+    def test_duplicates_are_rejected(self):
+        LikePost.objects.create(post=self.post, user_id='TestUser')
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LikePost.objects.create(post=self.post, user_id='TestUser')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+
+    def test_deleting_post_deletes_its_likes(self):
+        LikePost.objects.create(post=self.post, user_id='TestUser')
+
+        self.post.delete()
+
+        self.assertFalse(LikePost.objects.exists())
@@ -0,0 +1,51 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from core.models import Profile
+from core.loaders import ProfileLoader
+
+
+class TestProfileLoader(TestCase):
+    def setUp(self):
+        cache.clear()
+        for username in ('TestUser', 'AnotherUser', 'ThirdUser'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        User.objects.create_user(username='NoProfile', password='testpassword')
+        self.user = User.objects.get(username='TestUser')
+
+    def test_queued_keys_are_resolved_in_one_query(self):
+        loader = ProfileLoader()
+        another = User.objects.get(username='AnotherUser')
+        loader.queue(usernames=['ThirdUser'], user_ids=[self.user.id], id_users=[another.id])
+
+        with self.assertNumQueries(1):
+            self.assertEquals(loader.get(username='ThirdUser').user.username, 'ThirdUser')
+            self.assertEquals(loader.get(user_id=self.user.id).user.username, 'TestUser')
+            self.assertEquals(loader.get(id_user=another.id).user.username, 'AnotherUser')
+
+    def test_identity_map(self):
+        loader = ProfileLoader()
+        profile = loader.get(username='TestUser')
+
+        with self.assertNumQueries(0):
+            self.assertIs(loader.get(user_id=self.user.id), profile)
+            self.assertEquals(loader.get_many(usernames=['TestUser']), [profile])
+
+    def test_missing_profiles(self):
+        loader = ProfileLoader()
+
+        with self.assertNumQueries(1):
+            profiles = loader.get_many(usernames=['AnotherUser', 'NoProfile', 'Unknown', 'TestUser'])
+            self.assertRaises(Profile.DoesNotExist, loader.get, username='NoProfile')
+        self.assertEquals([profile.user.username for profile in profiles], ['AnotherUser', 'TestUser'])
+
+    def test_index_loads_viewer_with_suggestions(self):
+        client = Client()
+        client.force_login(self.user)
+
+        response = client.get('/')
+
+        self.assertEquals(response.context['user_profile'].user.username, 'TestUser')
+        self.assertEquals(len(response.context['suggestions_username_profile_list']), 2)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestMediaServing(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'post_images'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'post_images', 'picture.png'), 'wb') as file:
+            file.write(b'0123456789')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.url = '/media/post_images/picture.png'
+
+    def test_serves_file_with_cache_headers(self):
+        response = self.client.get(self.url)
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(b''.join(response.streaming_content), b'0123456789')
+        self.assertEquals(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+
+        etag_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        date_response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEquals(etag_response.status_code, 304)
+        self.assertEquals(date_response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        suffix_response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        invalid_response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+
+        self.assertEquals(response.status_code, 206)
+        self.assertEquals(b''.join(response.streaming_content), b'234')
+        self.assertEquals(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEquals(b''.join(suffix_response.streaming_content), b'789')
+        self.assertEquals(invalid_response.status_code, 416)
+
+    def test_stale_if_range_serves_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"stale"')
+
+        self.assertEquals(response.status_code, 200)
+
+    def test_missing_and_escaping_paths(self):
+        self.assertEquals(self.client.get('/media/post_images/missing.png').status_code, 404)
+        self.assertEquals(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_offloads_to_front_server(self):
+        with mock.patch('core.media.MEDIA_SENDFILE_BACKEND', 'x-accel-redirect'):
+            response = self.client.get(self.url)
+
+        self.assertEquals(response['X-Accel-Redirect'], '/protected-media/post_images/picture.png')
+        self.assertEquals(response.content, b'')
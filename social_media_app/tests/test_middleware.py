@@ -0,0 +1,46 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+
+from core.models import Profile
+from core.middleware import QueryBudgetExceeded
+
+
+class TestRequestMetricsMiddleware(TestCase):
+    def setUp(self):
+        self.client = Client()
+        user = User.objects.create_user(username='TestUser', password='testpassword')
+        Profile.objects.create(user=user, id_user=user.id)
+        self.client.force_login(user)
+
+    @override_settings(REQUEST_METRICS_HEADERS=True)
+    def test_records_metrics_per_url_name(self):
+        response = self.client.get('/profile/TestUser')
+
+        metrics = response.wsgi_request.metrics
+        self.assertEquals(metrics.url_name, 'profile')
+        self.assertTrue(metrics.queries > 0)
+        self.assertTrue(metrics.template_time > 0)
+        self.assertTrue(metrics.wall_time >= metrics.db_time)
+        self.assertIn(f'desc="{metrics.queries} queries"', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGETS={'profile': 1})
+    def test_exceeded_budget_fails_tests(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/profile/TestUser')
+
+    @override_settings(QUERY_BUDGETS={'profile': 1}, QUERY_BUDGET_STRICT=False)
+    def test_exceeded_budget_logs_warning(self):
+        with self.assertLogs('core.metrics', level='WARNING') as logs:
+            response = self.client.get('/profile/TestUser')
+
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('View profile issued', logs.output[0])
+
+    @override_settings(REQUEST_METRICS_HEADERS=True)
+    def test_records_render_time_per_template_and_block(self):
+        response = self.client.get('/profile/TestUser')
+
+        timings = response.wsgi_request.metrics.template_timings
+        self.assertIn('profile.html', timings)
+        self.assertTrue(any(label.startswith('profile.html#fragment ') for label in timings))
+        self.assertIn('desc="profile.html"', response['Server-Timing'])
@@ -0,0 +1,105 @@
+import io
+import threading
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, MD5PasswordHasher
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from core.models import Profile
+from core import passwords
+
+
+class TestPasswordHashing(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def test_signup_hashes_once(self):
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True,
+                               side_effect=PBKDF2PasswordHasher.encode) as encode:
+            response = self.client.post('/signup', {
+                'username': 'TestUser',
+                'email': 'testuser@gmail.com',
+                'password': 'testpassword',
+                'password2': 'testpassword',
+            })
+
+        self.assertRedirects(response, '/settings')
+        self.assertEquals(encode.call_count, 1)
+        user = User.objects.get(username='TestUser')
+        self.assertTrue(user.check_password('testpassword'))
+        self.assertEquals(int(self.client.session['_auth_user_id']), user.id)
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+
+    def test_signin_hashes_in_pool(self):
+        User.objects.create_user(username='TestUser', password='testpassword')
+        threads = []
+        verify = PBKDF2PasswordHasher.verify
+
+        def record_thread(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return verify(*args, **kwargs)
+
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=record_thread):
+            response = self.client.post('/signin', {'username': 'TestUser', 'password': 'testpassword'})
+
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertTrue(threads[0].startswith('password-hashing'))
+
+    def test_wrong_password(self):
+        User.objects.create_user(username='TestUser', password='testpassword')
+
+        response = self.client.post('/signin', {'username': 'TestUser', 'password': 'wrongpassword'})
+
+        self.assertRedirects(response, '/signin')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_failed_signin_hashes_once_in_pool(self):
+        User.objects.create_user(username='TestUser', password='testpassword')
+        threads = []
+        encode = PBKDF2PasswordHasher.encode
+
+        def record_thread(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return encode(*args, **kwargs)
+
+        # verify hashes with encode as well, ModelBackend must not hash a second time on the request thread
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=record_thread):
+            self.client.post('/signin', {'username': 'TestUser', 'password': 'wrongpassword'})
+            self.client.post('/signin', {'username': 'NoSuchUser', 'password': 'testpassword'})
+
+        self.assertEquals(len(threads), 2)
+        self.assertTrue(all(thread.startswith('password-hashing') for thread in threads))
+
+    def test_outdated_hash_is_upgraded(self):
+        user = User.objects.create(username='TestUser', password=MD5PasswordHasher().encode('testpassword', 'salt'))
+
+        with self.settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]):
+            self.client.post('/signin', {'username': 'TestUser', 'password': 'testpassword'})
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+    def test_full_backlog_answers_503(self):
+        User.objects.create_user(username='TestUser', password='testpassword')
+
+        with mock.patch.object(passwords, '_slots', threading.BoundedSemaphore(1)) as slots, \
+                mock.patch.object(passwords, 'PASSWORD_HASHING_WAIT', 0):
+            slots.acquire()
+            response = self.client.post('/signin', {'username': 'TestUser', 'password': 'testpassword'})
+
+        self.assertEquals(response.status_code, 503)
+        self.assertEquals(response['Retry-After'], str(passwords.PASSWORD_HASHING_RETRY_AFTER))
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_benchmark_hashers(self):
+        out = io.StringIO()
+        with self.settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            call_command('benchmark_hashers', duration=0.05, threads=2, stdout=out)
+
+        self.assertIn('md5: ', out.getvalue())
+        self.assertIn('on 2 threads', out.getvalue())
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from core.models import Profile, Post, LikePost, FollowersCount, Task
+from core import ranking, likes, tasks, timeline, feed
+
+
+class TestRanking(TestCase):
+    def setUp(self):
+        self.client = Client()
+        for username in ('TestUser', 'AnotherUser'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.client.force_login(User.objects.get(username='TestUser'))
+        self.addCleanup(likes.buffer.drain)
+
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+        now = timezone.now()
+        self.old = Post.objects.create(user_id='AnotherUser', caption='Old', image='post_images/credit-cards.png', created_at=now - timedelta(days=3))
+        self.new = Post.objects.create(user_id='AnotherUser', caption='New', image='post_images/credit-cards.png', created_at=now)
+        timeline.rebuild(User.objects.get(username='TestUser'))
+
+    def test_like_raises_score(self):
+        self.client.get('/like-post', {'post_id': self.old.id})
+        likes.buffer.flush()
+
+        score = Post.objects.get(id=self.old.id).score
+        self.assertAlmostEqual(score, ranking.weight(self.old.created_at, ranking.decay_time()))
+        self.assertTrue(0 < score < 0.25)
+
+    def test_top_mode_orders_by_score(self):
+        LikePost.objects.create(post=self.old, user_id='TestUser')
+        ranking.redecay()
+
+        response = self.client.get('/', {'mode': 'top'})
+        self.assertEquals([post.caption for post in response.context['posts']], ['Old', 'New'])
+        self.assertEquals(response.context['feed_mode'], 'top')
+
+        response = self.client.get('/api/feed', {'mode': 'top'})
+        self.assertEquals([post['caption'] for post in response.json()['posts']], ['Old', 'New'])
+
+        response = self.client.get('/')
+        self.assertEquals([post.caption for post in response.context['posts']], ['New', 'Old'])
+
+    def test_ranked_pages_merge_the_best_posts_of_every_followee(self):
+        user = User.objects.create_user(username='ThirdUser', password='testpassword')
+        Profile.objects.create(user=user, id_user=user.id)
+        FollowersCount.objects.create(follower_id='TestUser', user_id='ThirdUser')
+        Post.objects.filter(id=self.old.id).update(score=6)
+        Post.objects.filter(id=self.new.id).update(score=1)
+        for score in (5, 4, 3, 2):
+            Post.objects.create(user_id='ThirdUser', caption=str(score), image='post_images/credit-cards.png', score=score)
+        # not followed, must not show up even with the highest score
+        Post.objects.create(user_id='TestUser', caption='Own', image='post_images/credit-cards.png', score=10)
+
+        pages = []
+        before = None
+        while True:
+            posts = feed.ranked_posts('TestUser', before=before, limit=2)
+            if not posts:
+                break
+            pages.append([post.caption for post in posts])
+            before = posts[-1]
+
+        self.assertEquals(pages, [['Old', '5'], ['4', '3'], ['2', 'New']])
+
+    def test_recent_likes_outweigh_older_ones(self):
+        for username in ('TestUser', 'AnotherUser'):
+            LikePost.objects.create(post=self.old, user_id=username)
+        LikePost.objects.create(post=self.new, user_id='TestUser')
+
+        self.assertEquals(ranking.redecay(batch_size=1), (2, 2))
+
+        self.assertTrue(Post.objects.get(id=self.new.id).score > Post.objects.get(id=self.old.id).score)
+
+    def test_redecay_reschedules_itself(self):
+        tasks.enqueue('ranking.redecay', {}, key='ranking.redecay')
+
+        tasks.run_batch()
+
+        task = Task.objects.get(name='ranking.redecay')
+        next_interval = ranking.decay_time() + timedelta(seconds=ranking.FEED_SCORE_DECAY_INTERVAL)
+        self.assertAlmostEqual(task.run_at.timestamp(), next_interval.timestamp(), places=3)
+        self.assertEquals(task.payload, {'at': ranking.decay_time().timestamp()})
+
+    def test_redecay_task_rescales_without_counting_likes(self):
+        # a like still buffered by a web process is not in the score yet, the task must not count it
+        LikePost.objects.create(post=self.old, user_id='TestUser')
+        Post.objects.filter(id=self.new.id).update(score=1)
+        at = ranking.decay_time()
+        previous = at - timedelta(seconds=2 * ranking.FEED_SCORE_DECAY_INTERVAL)
+        tasks.enqueue('ranking.redecay', {'at': previous.timestamp()}, key='ranking.redecay')
+
+        tasks.run_batch()
+
+        self.assertAlmostEqual(Post.objects.get(id=self.new.id).score, ranking.weight(previous, at))
+        self.assertEquals(Post.objects.get(id=self.old.id).score, 0)
+        self.assertEquals(Task.objects.get(name='ranking.redecay').payload, {'at': at.timestamp()})
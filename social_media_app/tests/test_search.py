@@ -0,0 +1,54 @@
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+
+from core.models import Profile
+from core import search_index
+
+
+class TestSearchIndex(TestCase):
+    def setUp(self):
+        self.client = Client()
+        for username in ('TestUser', 'Tester', 'LatestNews', 'Test', 'Another'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+            search_index.index_user(user)
+        self.client.force_login(User.objects.get(username='Another'))
+
+    def usernames(self, query, **kwargs):
+        profiles, _ = search_index.search_profiles(query, **kwargs)
+        return [profile.user.username for profile in profiles]
+
+    def test_exact_then_prefix_then_substring(self):
+        self.assertEquals(self.usernames('test'), ['Test', 'Tester', 'TestUser', 'LatestNews'])
+
+    def test_short_queries(self):
+        self.assertEquals(self.usernames('no'), ['Another'])
+        self.assertEquals(self.usernames('w'), ['LatestNews'])
+
+    def test_short_queries_rank_a_bounded_candidate_set(self):
+        with mock.patch('core.search_index.SEARCH_SHORT_QUERY_LIMIT', 1):
+            usernames = self.usernames('t')
+
+        # one username beginning with the query and one other match at most
+        self.assertIn('TestUser', usernames)
+        self.assertTrue(len(usernames) <= 2)
+
+    def test_no_false_positives_from_trigrams(self):
+        self.assertEquals(self.usernames('tuser'), ['TestUser'])
+        self.assertEquals(self.usernames('usertest'), [])
+
+    def test_pagination(self):
+        first, has_next = search_index.search_profiles('test', limit=3)
+        second, has_more = search_index.search_profiles('test', page=2, limit=3)
+
+        self.assertTrue(has_next)
+        self.assertFalse(has_more)
+        self.assertEquals([profile.user.username for profile in second], ['LatestNews'])
+
+    def test_search_view_pages(self):
+        response = self.client.post('/search', {'username': 'test', 'page': '2'})
+
+        self.assertEquals(response.context['page'], 2)
+        self.assertEquals(response.context['username_profile_list'], [])
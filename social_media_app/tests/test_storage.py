@@ -0,0 +1,145 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from core.models import Profile, Post, Blob
+from core.storage import media_storage, is_blob_name
+from core import blobs, cleanup
+
+
+class TestContentAddressedStorage(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media = media.name
+
+        user = User.objects.create_user(username='TestUser', password='testpassword')
+        Profile.objects.create(user=user, id_user=user.id)
+        self.client = Client()
+        self.client.force_login(user)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media, name))
+
+    def stored_files(self, directory):
+        return sorted(
+            os.path.relpath(os.path.join(root, filename), self.media)
+            for root, _, filenames in os.walk(os.path.join(self.media, directory))
+            for filename in filenames
+        )
+
+    def test_equal_content_is_stored_once(self):
+        first = media_storage().save('post_images/one.PNG', ContentFile(b'same bytes'))
+        second = media_storage().save('post_images/two.png', ContentFile(b'same bytes'))
+        other = media_storage().save('post_images/one.png', ContentFile(b'other bytes'))
+
+        self.assertEquals(first, second)
+        self.assertNotEquals(first, other)
+        self.assertRegex(first, r'^post_images/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{36}\.png$')
+        self.assertTrue(is_blob_name(first))
+        self.assertEquals(self.stored_files('post_images'), sorted([first, other]))
+
+    def upload(self, content=b'image bytes'):
+        self.client.post('/upload', {
+            'image_upload': SimpleUploadedFile('photo.png', content, content_type='image/png'),
+            'caption': 'Some Caption',
+        })
+        return Post.objects.order_by('created_at').last()
+
+    def test_uploads_count_references(self):
+        first = self.upload()
+        second = self.upload()
+
+        self.assertEquals(first.image.name, second.image.name)
+        self.assertEquals(Blob.objects.get(name=first.image.name).references, 2)
+
+        cleanup.delete_post(first.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            cleanup.purge_post(first.id)
+        self.assertTrue(self.exists(second.image.name))
+
+        cleanup.delete_post(second.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            cleanup.purge_post(second.id)
+        self.assertFalse(Blob.objects.exists())
+        # the file is left to the orphan sweep, an upload of the same content may still reuse it
+        self.assertTrue(self.exists(second.image.name))
+
+        cleanup.sweep_orphaned_files(grace=0)
+        self.assertFalse(self.exists(second.image.name))
+
+    def test_reupload_of_released_blob_survives_sweep(self):
+        post = self.upload()
+        name = post.image.name
+        cleanup.delete_post(post.id)
+        cleanup.purge_post(post.id)
+        os.utime(os.path.join(self.media, name), (0, 0))
+
+        again = self.upload()
+        cleanup.sweep_orphaned_files(grace=60 * 60)
+
+        self.assertEquals(again.image.name, name)
+        self.assertTrue(self.exists(name))
+        self.assertEquals(Blob.objects.get(name=name).references, 1)
+
+    def test_sweep_deletes_unreferenced_profile_blobs(self):
+        name = media_storage().save('profile_images/avatar.png', ContentFile(b'avatar bytes'))
+        legacy = os.path.join(self.media, 'profile_images', 'legacy.png')
+        with open(legacy, 'wb') as file:
+            file.write(b'legacy bytes')
+
+        cleanup.sweep_orphaned_files(grace=0)
+
+        self.assertFalse(self.exists(name))
+        self.assertTrue(os.path.exists(legacy))
+
+    def test_concurrent_purges_release_once(self):
+        first = self.upload()
+        second = self.upload()
+        cleanup.delete_post(first.id)
+
+        def purged_concurrently(queryset, batch_size):
+            # another worker purges the same post while this one deletes its likes
+            Post.all_objects.filter(id=first.id).delete()
+            return 0
+
+        with mock.patch.object(cleanup, '_delete_in_batches', side_effect=purged_concurrently):
+            cleanup.purge_post(first.id)
+
+        self.assertEquals(Blob.objects.get(name=second.image.name).references, 2)
+
+    def test_dedupe_media(self):
+        for name in ('post_images/photo.png', 'post_images/photo_aB3dE9x.png', 'profile_images/avatar.png'):
+            os.makedirs(os.path.dirname(os.path.join(self.media, name)), exist_ok=True)
+            with open(os.path.join(self.media, name), 'wb') as file:
+                file.write(b'same bytes')
+        Post.objects.create(user_id='TestUser', caption='First', image='post_images/photo.png')
+        Post.objects.create(user_id='TestUser', caption='Second', image='post_images/photo_aB3dE9x.png')
+        Post.objects.create(user_id='TestUser', caption='Missing', image='post_images/missing.png')
+        Profile.objects.filter(user__username='TestUser').update(profileimg='profile_images/avatar.png')
+
+        out = io.StringIO()
+        call_command('dedupe_media', batch_size=1, stdout=out)
+
+        names = set(Post.objects.exclude(caption='Missing').values_list('image', flat=True))
+        self.assertEquals(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_blob_name(name))
+        self.assertEquals(self.stored_files('post_images'), [name])
+        self.assertEquals(Blob.objects.get(name=name).references, 2)
+        self.assertTrue(is_blob_name(Profile.objects.get().profileimg.name))
+        self.assertIn('Post.image: moved 2 files, freed 0.0 MB, 1 files missing', out.getvalue())
+
+        # nothing is left to move
+        call_command('dedupe_media', stdout=out)
+        self.assertEquals(Blob.objects.get(name=name).references, 2)
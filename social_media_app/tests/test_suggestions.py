@@ -0,0 +1,52 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from core.models import Profile, FollowersCount
+from core import suggestions, counters
+
+
+class TestSuggestions(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        for username in ('TestUser', 'Friend', 'FriendOfFriend', 'Popular', 'Fan', 'Fan2', 'Newbie'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.client.force_login(User.objects.get(username='TestUser'))
+
+        FollowersCount.objects.create(follower_id='TestUser', user_id='Friend')
+        FollowersCount.objects.create(follower_id='Friend', user_id='FriendOfFriend')
+        FollowersCount.objects.create(follower_id='Fan', user_id='Popular')
+        FollowersCount.objects.create(follower_id='Fan2', user_id='Popular')
+        counters.reconcile()
+
+    def test_pool_ranks_friends_of_friends_then_popular(self):
+        pool = suggestions.compute_pool('TestUser')
+
+        self.assertEquals(pool[:2], ['FriendOfFriend', 'Popular'])
+        self.assertNotIn('TestUser', pool)
+        self.assertNotIn('Friend', pool)
+
+    def test_popular_users_ranked_by_follower_counter(self):
+        Profile.objects.filter(user__username='Newbie').update(followers_count=5)
+
+        pool = suggestions.compute_pool('TestUser')
+
+        self.assertEquals(pool[:3], ['FriendOfFriend', 'Newbie', 'Popular'])
+
+    def test_constant_number_of_queries(self):
+        with self.assertNumQueries(4):
+            profiles = suggestions.suggestions_for('TestUser')
+        self.assertEquals(len(profiles), suggestions.SUGGESTIONS_COUNT)
+
+        # the pool is precomputed now, only profiles are loaded
+        with self.assertNumQueries(1):
+            suggestions.suggestions_for('TestUser')
+
+    def test_follow_refreshes_pool(self):
+        suggestions.suggestions_for('TestUser')
+
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'FriendOfFriend'})
+
+        self.assertNotIn('FriendOfFriend', suggestions.suggestions_for('TestUser', count=10))
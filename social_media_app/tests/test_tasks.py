@@ -0,0 +1,116 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command, CommandError
+from django.utils import timezone
+
+from core.models import Task
+from core import tasks
+
+calls = []
+
+
+@tasks.handler('test.record', batch_size=2)
+def record(payloads):
+    calls.append([payload['n'] for payload in payloads])
+
+
+@tasks.handler('test.fail', max_attempts=2)
+def fail(payloads):
+    raise ValueError('broken')
+
+
+@tasks.handler('test.some_fail', batch_size=3)
+def some_fail(payloads):
+    for payload in payloads:
+        if payload['n'] < 0:
+            raise ValueError('negative')
+    calls.append([payload['n'] for payload in payloads])
+
+
+class TestTasks(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_tasks_of_one_name_run_in_batches(self):
+        for n in range(3):
+            tasks.enqueue('test.record', {'n': n})
+
+        self.assertEquals(tasks.run_pending(), 3)
+
+        self.assertEquals(calls, [[0, 1], [2]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_queued_key_is_enqueued_once(self):
+        tasks.enqueue('test.record', {'n': 1}, key='same')
+        tasks.enqueue('test.record', {'n': 2}, key='same')
+        tasks.run_pending()
+        tasks.enqueue('test.record', {'n': 3}, key='same')
+        tasks.run_pending()
+
+        self.assertEquals(calls, [[1], [3]])
+
+    def test_failed_tasks_are_retried_with_backoff(self):
+        tasks.enqueue('test.fail', {})
+
+        with self.assertLogs('core.tasks', level='ERROR'):
+            tasks.run_pending()
+        task = Task.objects.get()
+        self.assertEquals((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertEquals(task.last_error, 'ValueError: broken')
+        self.assertTrue(task.run_at > timezone.now() + timedelta(seconds=tasks.TASKS_RETRY_DELAY - 1))
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', level='ERROR'):
+            tasks.run_pending()
+        self.assertEquals(Task.objects.get().status, Task.FAILED)
+
+    def test_failing_payload_does_not_hold_back_its_batch(self):
+        for n in (1, -1, 2):
+            tasks.enqueue('test.some_fail', {'n': n})
+
+        with self.assertLogs('core.tasks', level='ERROR'):
+            self.assertEquals(tasks.run_batch(), 3)
+
+        self.assertEquals(calls, [[1], [2]])
+        task = Task.objects.get()
+        self.assertEquals((task.payload, task.status), ({'n': -1}, Task.QUEUED))
+        self.assertEquals(task.last_error, 'ValueError: negative')
+
+    def test_expired_lease_is_claimed_again(self):
+        tasks.enqueue('test.record', {'n': 1})
+        Task.objects.update(status=Task.RUNNING, claim='crashed', locked_until=timezone.now() - timedelta(seconds=1))
+
+        tasks.run_pending()
+
+        self.assertEquals(calls, [[1]])
+
+    def test_task_abandoned_on_every_attempt_fails(self):
+        tasks.enqueue('test.fail', {})
+        Task.objects.update(
+            status=Task.RUNNING, claim='crashed', attempts=2, locked_until=timezone.now() - timedelta(seconds=1),
+        )
+
+        with self.assertLogs('core.tasks', level='ERROR'):
+            self.assertEquals(tasks.run_pending(), 0)
+
+        self.assertEquals(Task.objects.get().status, Task.FAILED)
+
+    def test_stats_report_queue_depth(self):
+        tasks.enqueue('test.record', {'n': 1})
+        tasks.enqueue('test.record', {'n': 2}, delay=60)
+
+        out = StringIO()
+        call_command('run_tasks', '--stats', stdout=out)
+
+        self.assertIn('"queued": 2', out.getvalue())
+        self.assertEquals(tasks.depth()['test.record'][Task.RUNNING], 0)
+
+    def test_worker_refuses_process_local_caches(self):
+        tasks.enqueue('test.record', {'n': 1})
+
+        with self.assertRaisesMessage(CommandError, "'default'"):
+            call_command('run_tasks', '--once', stdout=StringIO())
+
+        self.assertEquals(calls, [])
@@ -0,0 +1,17 @@
+from django.template import engines
+from django.test import SimpleTestCase
+
+from core.template_cache import core_template_names, warm
+
+
+class TestTemplateCache(SimpleTestCase):
+    def test_warm_compiles_every_core_template(self):
+        names = core_template_names()
+
+        self.assertIn('index.html', names)
+        self.assertEquals(warm(), len(names))
+
+    def test_templates_are_compiled_once(self):
+        engine = engines['django']
+
+        self.assertIs(engine.get_template('signin.html').template, engine.get_template('signin.html').template)
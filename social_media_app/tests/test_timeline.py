@@ -0,0 +1,103 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.models import Profile, Post, FollowersCount, TimelineEntry, Task
+from core import timeline, tasks
+
+
+class TestTimeline(TestCase):
+    def setUp(self):
+        self.client = Client()
+        for username in ('TestUser', 'AnotherUser', 'AnotherUser2'):
+            user = User.objects.create_user(username=username, password='testpassword')
+            Profile.objects.create(user=user, id_user=user.id)
+        self.user = User.objects.get(username='TestUser')
+        self.client.force_login(self.user)
+
+    def test_follow_backfills_timeline(self):
+        Post.objects.create(user_id='AnotherUser', caption='Old post')
+
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'AnotherUser'})
+        tasks.run_pending()
+
+        self.assertEquals(TimelineEntry.objects.filter(owner=self.user).count(), 1)
+
+    def test_upload_fans_out_to_followers(self):
+        FollowersCount.objects.create(follower_id='AnotherUser', user_id='TestUser')
+        FollowersCount.objects.create(follower_id='AnotherUser2', user_id='TestUser')
+
+        self.client.post('/upload', {'caption': 'Some Caption'})
+
+        owners = TimelineEntry.objects.values_list('owner__username', flat=True)
+        self.assertEquals(sorted(owners), ['AnotherUser', 'AnotherUser2'])
+
+    def test_unfollow_retracts_posts(self):
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'AnotherUser'})
+        Post.objects.create(user_id='AnotherUser', caption='Some Caption')
+        timeline.rebuild(self.user)
+
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'AnotherUser'})
+        tasks.run_pending()
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user).exists())
+
+    def test_delete_post_removes_entries(self):
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'AnotherUser'})
+        post = Post.objects.create(user_id='AnotherUser', caption='Some Caption')
+        timeline.fan_out(post)
+
+        post.delete()
+
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_index_reads_newest_posts_first(self):
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'AnotherUser'})
+        self.client.post('/follow', {'follower': 'TestUser', 'user': 'AnotherUser2'})
+        first = Post.objects.create(user_id='AnotherUser', caption='First', image='post_images/credit-cards.png')
+        timeline.fan_out(first)
+        second = Post.objects.create(user_id='AnotherUser2', caption='Second', image='post_images/credit-cards.png')
+        timeline.fan_out(second)
+
+        response = self.client.get('/')
+
+        self.assertEquals([post.caption for post in response.context['posts']], ['Second', 'First'])
+
+    def test_rebuild_timelines_command(self):
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+        Post.objects.create(user_id='AnotherUser', caption='Some Caption')
+        Post.objects.create(user_id='AnotherUser2', caption='Not followed')
+
+        call_command('rebuild_timelines', stdout=StringIO())
+
+        self.assertEquals(
+            list(TimelineEntry.objects.values_list('owner__username', 'author')),
+            [('TestUser', 'AnotherUser')],
+        )
+
+    def test_follow_task_key_fits_longest_usernames(self):
+        timeline.sync_follow('a' * 150, 'b' * 150)
+        timeline.sync_follow('a' * 150, 'c' * 150)
+
+        keys = list(Task.objects.values_list('key', flat=True))
+        self.assertEquals(len(set(keys)), 2)
+        self.assertTrue(all(len(key) <= Task._meta.get_field('key').max_length for key in keys))
+
+    def test_fan_out_trims_full_timelines(self):
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+        start = timezone.now()
+        with mock.patch('core.timeline.TIMELINE_MAX_LENGTH', 2):
+            for minutes in range(3):
+                timeline.fan_out(Post.objects.create(
+                    user_id='AnotherUser', caption=f'Post {minutes}', created_at=start + timedelta(minutes=minutes),
+                ))
+
+        self.assertEquals(
+            sorted(TimelineEntry.objects.filter(owner=self.user).values_list('post__caption', flat=True)),
+            ['Post 1', 'Post 2'],
+        )
@@ -4,14 +4,18 @@ from django.contrib.messages import get_messages
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 import uuid
+from unittest import mock
 
-from core.models import Post
+from core.models import Post, FollowersCount
+from core import likes, tasks
 
 class TestView(TestCase):
     def setUp(self):
         self.client = Client()
         self.index_url = reverse('index')
         self.like_post_url = reverse('like-post')
+        # likes of posts rolled back with the test must not stay buffered
+        self.addCleanup(likes.buffer.drain)
 
     def test_index_GET(self):
         response = self.client.get(self.index_url)
@@ -235,6 +239,7 @@ class TestView(TestCase):
             'follower': 'TestUser',
             'user': 'AnotherUser'
         })
+        tasks.run_pending()
 
         profile_response = self.client.post('/profile/TestUser')
 
@@ -244,6 +249,7 @@ class TestView(TestCase):
             'follower': 'TestUser',
             'user': 'AnotherUser2'
         })
+        tasks.run_pending()
 
         profile_response = self.client.post('/profile/TestUser')
 
@@ -254,11 +260,39 @@ class TestView(TestCase):
             'follower': 'TestUser',
             'user': 'AnotherUser'
         })
+        tasks.run_pending()
 
         profile_response = self.client.post('/profile/TestUser')
 
         self.assertEquals(profile_response.context['user_following'], 1)
 
+    def test_follow_unknown_user_POST(self):
+        self.test_signup_POST()
+
+        response = self.client.post('/follow', {
+            'follower': 'TestUser',
+            'user': 'NoSuchUser'
+        })
+
+        self.assertEquals(response.status_code, 404)
+        self.assertFalse(FollowersCount.objects.exists())
+
+    def test_concurrent_follow_POST(self):
+        self.test_signup_POST()
+        self.test_signup_POST('AnotherUser', 'anotheruser@gmail.com')
+        FollowersCount.objects.create(follower_id='TestUser', user_id='AnotherUser')
+
+        # a concurrent request follows between the unfollow check and the insert
+        with mock.patch.object(FollowersCount.objects, 'filter') as filter:
+            filter.return_value.delete.return_value = (0, {})
+            response = self.client.post('/follow', {
+                'follower': 'TestUser',
+                'user': 'AnotherUser'
+            })
+
+        self.assertEquals(response.status_code, 302)
+        self.assertEquals(FollowersCount.objects.filter(follower='TestUser', user='AnotherUser').count(), 1)
+
     def test_settings_POST(self):
         self.test_signup_POST()
 
@@ -0,0 +1,59 @@
+/* ----------------- Infinite scroll of the home feed ----------------- */
+/* index renders the first screen, older pages are fetched from the feed API once #feed-more gets visible */
+(function($){
+    "use strict";
+
+    function likesText(likes) {
+        if (likes === 0) {
+            return 'No likes';
+        }
+        if (likes === 1) {
+            return 'Liked by 1 person';
+        }
+        return 'Liked by ' + likes + ' people';
+    }
+
+    function renderPost(template, post) {
+        var $post = $(template.content.cloneNode(true));
+        $post.find('[data-feed-author-link]').attr('href', '/profile/' + encodeURIComponent(post.author));
+        $post.find('[data-feed-author]').text(post.author);
+        $post.find('[data-feed-image]').attr('src', post.thumbnail);
+        $post.find('[data-feed-image-link]').attr('href', post.thumbnail);
+        $post.find('[data-feed-like]').attr('href', '/like-post?post_id=' + post.id);
+        $post.find('[data-feed-likes]').text(likesText(post.likes));
+        $post.find('[data-feed-caption]').text(post.caption);
+        return $post;
+    }
+
+    $(document).ready(function(){
+        var $more = $('#feed-more');
+        var template = document.getElementById('feed-post-template');
+        if (!$more.length || !template || !('IntersectionObserver' in window)) {
+            // the "Older posts" link keeps working without scripts
+            return;
+        }
+
+        var loading = false;
+        var observer = new IntersectionObserver(function(entries){
+            var cursor = $more.data('cursor');
+            if (!entries[0].isIntersecting || loading || !cursor) {
+                return;
+            }
+            loading = true;
+            $.getJSON($more.data('api'), {cursor: cursor, mode: $more.data('mode')}).done(function(page){
+                $.each(page.posts, function(_, post){
+                    $('#feed-posts').append(renderPost(template, post));
+                });
+                if (page.next_cursor) {
+                    $more.data('cursor', page.next_cursor);
+                } else {
+                    observer.disconnect();
+                    $more.remove();
+                }
+            }).always(function(){
+                loading = false;
+            });
+        }, {rootMargin: '600px'});
+        observer.observe($more[0]);
+    });
+})(jQuery);